@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares ways of pulling Episode fields out of saved story pages.
+
+Reports mean parse time per page and peak memory (via tracemalloc) for a full
+BeautifulSoup build, a SoupStrainer-limited parse, lxml if installed, and the
+streaming tokenizer nprcli.extract uses.
+
+    python benchmarks/bench_extract.py [-n ROUNDS] [fixture.html ...]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+from nprcli.extract import extract_fields
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'fixtures')
+
+
+def soup_fields(soup):
+    def text(tag, cls):
+        el = soup.find(tag, attrs={'class': cls})
+        return el.getText().strip() if el else None
+    download = soup.find('a', attrs={'class': 'download'}, href=True)
+    return {
+        'title': text('div', 'storytitle'),
+        'program': text('a', 'program'),
+        'date': text('span', 'date'),
+        'mp3': download['href'].strip() if download else None,
+    }
+
+def bs4_full(content):
+    from bs4 import BeautifulSoup
+    return soup_fields(BeautifulSoup(content, 'html.parser'))
+
+def bs4_strainer(content):
+    from bs4 import BeautifulSoup, SoupStrainer
+    wanted = SoupStrainer(['div', 'a', 'span'], attrs={'class': ['storytitle', 'program', 'date', 'download']})
+    return soup_fields(BeautifulSoup(content, 'html.parser', parse_only=wanted))
+
+def bs4_lxml(content):
+    from bs4 import BeautifulSoup
+    return soup_fields(BeautifulSoup(content, 'lxml'))
+
+def available(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+def measure(fn, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for content in pages:
+            fn(content)
+    elapsed = (time.perf_counter() - start) / (rounds * len(pages))
+
+    tracemalloc.start()
+    for content in pages:
+        fn(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--rounds', type=int, default=20)
+    parser.add_argument('pages', nargs='*', default=[
+        os.path.join(FIXTURES, 'story.html'),
+        os.path.join(FIXTURES, 'story-noaudio.html'),
+    ])
+    args = parser.parse_args(argv)
+
+    pages = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+
+    engines = [('streaming (nprcli.extract)', extract_fields)]
+    if available('bs4'):
+        engines += [('bs4 html.parser, full tree', bs4_full),
+                    ('bs4 html.parser, SoupStrainer', bs4_strainer)]
+        if available('lxml'):
+            engines.append(('bs4 lxml, full tree', bs4_lxml))
+
+    expected = [extract_fields(p) for p in pages]
+    print("{} pages, {} rounds".format(len(pages), args.rounds))
+    print("{:<32} {:>12} {:>14}".format('engine', 'ms/page', 'peak KiB'))
+    for name, fn in engines:
+        if [fn(p) for p in pages] != expected:
+            print("{:<32} fields differ from nprcli.extract".format(name))
+        elapsed, peak = measure(fn, pages, args.rounds)
+        print("{:<32} {:>12.3f} {:>14.1f}".format(name, elapsed * 1000, peak / 1024.0))
+
+if __name__ == '__main__':
+    main()
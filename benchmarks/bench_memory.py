@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures memory retained by a large playlist of resolved Episodes.
+
+A synthetic archive feed of N items is served by a local stand-in for
+npr.org, every item linking to the recorded story page in tests/fixtures.
+Each Episode is resolved from its page, then the memory still allocated
+with every Episode alive is reported, per episode, next to the size of the
+page each one was parsed from:
+
+    feed_only    episodes built from the feed, nothing resolved
+    resolved     every episode resolved from its article page
+
+    python benchmarks/bench_memory.py [-n EPISODES] [--json results.json]
+"""
+import os
+import gc
+import sys
+import json
+import argparse
+import platform
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from nprcli.client import Client
+from nprcli.index import EpisodeIndex
+from nprcli.models import Show
+from tests.support import StubServer
+
+FEED_URL = 'http://www.npr.org/archive/feed'
+ITEM = ('<item><title>Story {n}</title><pubDate>Mon, 05 Jan 2015 05:00:00 -0500</pubDate>'
+        '<link>http://www.npr.org/2015/01/05/{n}/story</link></item>')
+
+
+def archive(episodes):
+    items = ''.join(ITEM.format(n=n) for n in range(episodes))
+    return ('<?xml version="1.0"?><rss version="2.0"><channel><title>Archive</title>'
+            '{}</channel></rss>'.format(items)).encode('utf-8')
+
+def retained(build):
+    """Returns (bytes still allocated after build(), peak bytes) and build()'s result."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak, result
+
+def run(episodes):
+    with open(os.path.join(ROOT, 'tests', 'fixtures', 'story.html'), 'rb') as f:
+        page = f.read()
+    routes = {'/archive/feed': archive(episodes)}
+    for n in range(episodes):
+        routes['/2015/01/05/{}/story'.format(n)] = page
+    results = {}
+    with StubServer(routes) as server:
+        def show():
+            client = Client(hosts={'www.npr.org': server.url}, retries=0)
+            return Show(feed=FEED_URL, client=client, index=EpisodeIndex(path=':memory:'))
+
+        def feed_only():
+            return show().episodes
+
+        def resolved():
+            s = show()
+            s.prefetch()
+            return s.episodes
+
+        for name, build in (('feed_only', feed_only), ('resolved', resolved)):
+            current, peak, built = retained(build)
+            assert len(built) == episodes
+            results[name] = {
+                'retained_kb': current / 1024.0,
+                'peak_kb': peak / 1024.0,
+                'bytes_per_episode': current / float(episodes),
+            }
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'episodes': episodes,
+        'page_bytes': len(page),
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--episodes', type=int, default=1000)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args.episodes)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print("{} episodes, {} byte story page".format(report['episodes'], report['page_bytes']))
+    print("{:<12} {:>13} {:>10} {:>16}".format('playlist', 'retained KiB', 'peak KiB', 'bytes/episode'))
+    for name, r in report['results'].items():
+        print("{:<12} {:>13.1f} {:>10.1f} {:>16.0f}".format(
+            name, r['retained_kb'], r['peak_kb'], r['bytes_per_episode']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Times the fetch/parse/play pipeline offline, against recorded fixtures.
+
+The Morning Edition feed and story pages in tests/fixtures are served by a
+local stand-in for npr.org, and playback goes to a fake audio backend. Each
+stage is run several times on a cold cache and the median is reported:
+
+    feed_parse           parsing the recorded RSS feed
+    extract              pulling Episode fields from one story page
+    playlist_build       Show.prefetch() over every article in the feed
+    time_to_first_audio  Player.next_track() until the backend starts playing
+    navigation           one next/previous keypress on a resolved playlist
+
+    python benchmarks/bench_pipeline.py [-n ROUNDS] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from nprcli.backends import FakeBackend
+from nprcli.client import Client
+from nprcli.extract import extract_fields
+from nprcli.feed import iter_items
+from nprcli.index import EpisodeIndex
+from nprcli.models import Player, Show
+from tests.support import StubServer
+
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+FEED_URL = 'http://www.npr.org/rss/rss.php?id=3'
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+class TimedBackend(FakeBackend):
+
+    def load(self, source):
+        if not hasattr(self, 'loaded_at'):
+            self.loaded_at = time.perf_counter()
+        FakeBackend.load(self, source)
+
+
+class Pipeline(object):
+    """Recorded feed and pages behind a local server, plus fresh objects per run."""
+
+    def __init__(self):
+        self.feed = fixture('morning_edition.xml')
+        self.pages = [fixture('story.html'), fixture('story-noaudio.html')]
+        routes = {'/rss/rss.php?id=3': self.feed}
+        for item in iter_items([self.feed]):
+            path = item['link'].split('www.npr.org', 1)[1]
+            routes[path] = self.pages[1] if path.endswith('/story-2') else self.pages[0]
+        self.server = StubServer(routes)
+
+    def __enter__(self):
+        self.server.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.__exit__(*exc)
+
+    def show(self):
+        client = Client(hosts={'www.npr.org': self.server.url}, retries=0)
+        return Show(feed=FEED_URL, client=client, index=EpisodeIndex(path=':memory:'))
+
+    def player(self, backend=None):
+        return Player(show=self.show(), backend=backend or FakeBackend(),
+                      prefetch=0, verbose=False)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def bench_feed_parse(pipeline):
+    return timed(lambda: list(iter_items([pipeline.feed])))
+
+def bench_extract(pipeline):
+    return timed(lambda: extract_fields(pipeline.pages[0]))
+
+def bench_playlist_build(pipeline):
+    show = pipeline.show()
+    return timed(lambda: show.prefetch())
+
+def bench_time_to_first_audio(pipeline):
+    backend = TimedBackend()
+    player = pipeline.player(backend)
+    start = time.perf_counter()
+    player.next_track()
+    return backend.loaded_at - start
+
+def bench_navigation(pipeline):
+    player = pipeline.player()
+    list(player.playlist)
+    player.next_track()
+    presses = 10
+    def navigate():
+        for _ in range(presses // 2):
+            player.next_track()
+            player.previous_track()
+    return timed(navigate) / presses
+
+BENCHMARKS = [
+    ('feed_parse', bench_feed_parse),
+    ('extract', bench_extract),
+    ('playlist_build', bench_playlist_build),
+    ('time_to_first_audio', bench_time_to_first_audio),
+    ('navigation', bench_navigation),
+]
+
+
+def run(rounds=5, only=None):
+    results = {}
+    with Pipeline() as pipeline:
+        for name, fn in BENCHMARKS:
+            if only and name not in only:
+                continue
+            samples = [fn(pipeline) for _ in range(rounds)]
+            results[name] = {
+                'median_ms': statistics.median(samples) * 1000,
+                'min_ms': min(samples) * 1000,
+                'max_ms': max(samples) * 1000,
+                'rounds': rounds,
+            }
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--rounds', type=int, default=5)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON to PATH ('-' for stdout)")
+    parser.add_argument('only', nargs='*', metavar='BENCHMARK', help='run only these benchmarks')
+    args = parser.parse_args(argv)
+
+    report = run(args.rounds, args.only)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print("{:<22} {:>10} {:>10} {:>10}".format('benchmark', 'median ms', 'min ms', 'max ms'))
+    for name, r in report['results'].items():
+        print("{:<22} {:>10.3f} {:>10.3f} {:>10.3f}".format(name, r['median_ms'], r['min_ms'], r['max_ms']))
+
+if __name__ == '__main__':
+    main()
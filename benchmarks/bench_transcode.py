@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures transcoding throughput per core for `--compact` mode.
+
+Generates FILES stereo 128 kbit/s MP3s of SECONDS of audio each with ffmpeg,
+then converts all of them with a Transcoder at 1, 2, 4, ... workers up to
+the number of cores. For each worker count it reports audio seconds
+converted per wall-clock second, that figure per worker, and the size of
+the compact files relative to the originals:
+
+    python benchmarks/bench_transcode.py [--files N] [--seconds S] [--json results.json]
+
+Needs ffmpeg on PATH, or --ffmpeg.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from nprcli.transcode import Transcoder
+
+
+def make_inputs(ffmpeg, directory, files, seconds):
+    first = os.path.join(directory, 'input-0.mp3')
+    subprocess.check_call([ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+                           '-f', 'lavfi', '-i', 'sine=frequency=220:duration={}'.format(seconds),
+                           '-ac', '2', '-b:a', '128k', first])
+    paths = [first]
+    for n in range(1, files):
+        paths.append(os.path.join(directory, 'input-{}.mp3'.format(n)))
+        shutil.copyfile(first, paths[-1])
+    return paths
+
+def worker_counts(cores):
+    n = 1
+    while n < cores:
+        yield n
+        n *= 2
+    yield cores
+
+def run(ffmpeg, files, seconds):
+    cores = os.cpu_count() or 1
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        inputs = make_inputs(ffmpeg, directory, files, seconds)
+        for workers in worker_counts(cores):
+            transcoder = Transcoder(ffmpeg=ffmpeg, workers=workers)
+            start = time.perf_counter()
+            done = [f.result() for f in [transcoder.submit(p) for p in inputs]]
+            elapsed = time.perf_counter() - start
+            transcoder.close()
+            for r in done:
+                os.remove(r.path)
+            rate = files * seconds / elapsed
+            results[str(workers)] = {
+                'elapsed_s': elapsed,
+                'audio_s_per_s': rate,
+                'audio_s_per_s_per_worker': rate / workers,
+                'ratio': sum(r.size for r in done) / float(sum(r.source_size for r in done)),
+            }
+    finally:
+        shutil.rmtree(directory)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cores': cores,
+        'files': files,
+        'seconds': seconds,
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--seconds', type=int, default=120, help='length of each input')
+    parser.add_argument('--ffmpeg', default=shutil.which('ffmpeg'))
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+    if not args.ffmpeg:
+        print("ffmpeg not found; skipping transcode benchmark.")
+        return
+
+    report = run(args.ffmpeg, args.files, args.seconds)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print("{} files of {}s audio, {} cores".format(report['files'], report['seconds'], report['cores']))
+    print("{:>8} {:>10} {:>12} {:>18} {:>8}".format('workers', 'wall s', 'audio s/s', 'audio s/s/worker', 'size'))
+    for workers, r in report['results'].items():
+        print("{:>8} {:>10.2f} {:>12.1f} {:>18.1f} {:>7.0%}".format(
+            workers, r['elapsed_s'], r['audio_s_per_s'], r['audio_s_per_s_per_worker'], r['ratio']))
+
+if __name__ == '__main__':
+    main()
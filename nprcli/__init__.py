@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
-from .models import Show, Episode, Player
-
 __author__ = 'Conor Schaefer'
 __email__ = 'conor.schaefer@gmail.com'
 __version__ = '0.1.0'
+
+__all__ = ['Show', 'Episode', 'Player']
+
+
+def __getattr__(name):
+    # Loading models pulls in requests; defer it so `npr --help` stays fast.
+    if name in __all__:
+        from . import models
+        return getattr(models, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
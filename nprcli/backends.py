@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import threading
+import subprocess
+
+
+FINISHED = 'finished'  # current track played to the end
+EXITED = 'exited'      # backend process went away
+
+
+class Backend(object):
+    """Interface to the program that plays audio for a Player.
+
+    A backend stays alive across tracks. It reports events such as FINISHED
+    through read_events(), and fileno() becomes readable whenever some are
+    pending, so Player can wait on it with select() alongside stdin.
+    self.position is the last known offset into the current track, in
+    seconds, as of the last query_position().
+    """
+
+    def __init__(self):
+        self.position = 0.0
+        self._events = []
+        self._lock = threading.Lock()
+        self._r, self._w = os.pipe()
+
+    def load(self, source):
+        """Starts playing source (URL or path) now, replacing anything queued."""
+        raise NotImplementedError
+
+    def preload(self, source):
+        """Queues source to play straight after the current track."""
+
+    def seek(self, seconds):
+        """Jumps to seconds into the current track."""
+
+    def query_position(self):
+        """Asks for the current offset; self.position is updated when it arrives."""
+
+    def stop(self):
+        """Stops playback, keeping the backend ready for the next load()."""
+
+    def close(self):
+        """Stops playback and releases the backend."""
+        for fd in (self._r, self._w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def fileno(self):
+        return self._r
+
+    def emit(self, event):
+        with self._lock:
+            self._events.append(event)
+        try:
+            os.write(self._w, b'.')
+        except OSError:
+            pass
+
+    def read_events(self):
+        """Returns pending events, oldest first."""
+        try:
+            os.read(self._r, 1024)
+        except OSError:
+            pass
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+
+class MPlayerBackend(Backend):
+    """Single long-lived mplayer process driven in slave mode.
+
+    Tracks are switched with loadfile, and preload() appends the next track
+    to mplayer's own playlist so it starts without a gap. End of track is
+    read from mplayer's "EOF code: 1" status line, and the position from
+    its answers to get_time_pos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Backend.__init__(self)
+        self.path = kwargs.get('path', None) or shutil.which('mplayer') or '/usr/bin/mplayer'
+        self.cache_min = kwargs.get('cache_min', 20)
+        self._proc = None
+        # Commands also come from other threads, e.g. position queries.
+        self._command_lock = threading.Lock()
+
+    def _start(self):
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        cmd = [self.path, '-slave', '-idle', '-quiet', '-noconsolecontrols',
+               '-msglevel', 'global=6', '-cache-min', str(self.cache_min)]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, universal_newlines=True,
+                                      bufsize=1)
+        reader = threading.Thread(target=self._read_output, args=(self._proc,))
+        reader.daemon = True
+        reader.start()
+
+    def _read_output(self, proc):
+        for line in proc.stdout:
+            line = line.strip()
+            if line.startswith('ANS_TIME_POSITION='):
+                try:
+                    self.position = float(line.split('=', 1)[1])
+                except ValueError:
+                    pass
+            elif line == 'EOF code: 1':
+                self.position = 0.0
+                self.emit(FINISHED)
+        if proc is self._proc:
+            self.emit(EXITED)
+
+    def command(self, *words):
+        with self._command_lock:
+            self._start()
+            try:
+                self._proc.stdin.write(' '.join(words) + '\n')
+                self._proc.stdin.flush()
+            except (OSError, ValueError):
+                self.emit(EXITED)
+
+    @staticmethod
+    def _quote(source):
+        return '"{}"'.format(source.replace('\\', '\\\\').replace('"', '\\"'))
+
+    def load(self, source):
+        self.position = 0.0
+        self.command('loadfile', self._quote(source), '0')
+
+    def preload(self, source):
+        self.command('loadfile', self._quote(source), '1')
+
+    def seek(self, seconds):
+        # type 2 is an absolute position; pausing_keep leaves a pause in place.
+        self.position = float(seconds)
+        self.command('pausing_keep', 'seek', str(seconds), '2')
+
+    def query_position(self):
+        if self._proc is not None and self._proc.poll() is None:
+            self.command('pausing_keep_force', 'get_time_pos')
+
+    def stop(self):
+        if self._proc is not None and self._proc.poll() is None:
+            self.command('stop')
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.stdin.write('quit\n')
+                proc.stdin.flush()
+                proc.wait(2)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                proc.kill()
+        Backend.close(self)
+
+
+class FakeBackend(Backend):
+    """Backend that plays nothing, for tests and benchmarks.
+
+    Records every load, preload and seek in self.calls; finish() pretends
+    the current track reached its end. Set self.position to pretend time
+    has passed.
+    """
+
+    def __init__(self):
+        Backend.__init__(self)
+        self.calls = []
+        self.playing = None
+        self.queued = None
+
+    def load(self, source):
+        self.calls.append(('load', source))
+        self.playing, self.queued = source, None
+        self.position = 0.0
+
+    def preload(self, source):
+        self.calls.append(('preload', source))
+        self.queued = source
+
+    def seek(self, seconds):
+        self.calls.append(('seek', seconds))
+        self.position = float(seconds)
+
+    def stop(self):
+        self.calls.append(('stop',))
+        self.playing, self.queued = None, None
+
+    def finish(self):
+        self.playing, self.queued = self.queued, None
+        self.position = 0.0
+        self.emit(FINISHED)
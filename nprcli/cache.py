@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+# How long a cached body is served without asking npr.org, in seconds.
+FEED_TTL = 5 * 60
+ARTICLE_TTL = 7 * 24 * 60 * 60
+
+
+def cache_dir(*parts):
+    """Returns path under the nprcli cache directory, honoring XDG_CACHE_HOME."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'nprcli', *parts)
+
+def _write_atomic(path, data):
+    tmp = '{}.{}.tmp'.format(path, threading.get_ident())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class HTTPCache(object):
+    """Persistent on-disk cache of response bodies keyed by URL.
+
+    Each entry is a body file plus a small JSON file holding the ETag and
+    Last-Modified validators and the time it was last confirmed fresh. Once
+    the bodies exceed max_size bytes, the least recently used are evicted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.path = kwargs.get('path', None) or cache_dir('http')
+        self.max_size = kwargs.get('max_size', 64 * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.path, key)
+        return base + '.body', base + '.json'
+
+    def get(self, url):
+        """Returns (meta, body) for URL, or None if it isn't cached."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        try:
+            os.utime(body_path, None)
+        except OSError:
+            pass
+        return meta, body
+
+    def is_fresh(self, meta, ttl):
+        return time.time() - meta.get('fetched_at', 0) < ttl
+
+    def validators(self, meta):
+        """Returns conditional request headers for a cached entry."""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, body, headers=None):
+        headers = headers or {}
+        meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'size': len(body),
+        }
+        body_path, meta_path = self._paths(url)
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        self.evict()
+        return meta
+
+    def touch(self, url, meta):
+        """Marks a cached entry as fresh again, e.g. after a 304."""
+        meta = dict(meta, fetched_at=time.time())
+        _write_atomic(self._paths(url)[1], json.dumps(meta).encode('utf-8'))
+        return meta
+
+    def remove(self, url):
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        for name in os.listdir(self.path):
+            if not name.endswith('.body'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield path, st.st_size, st.st_mtime
+
+    def evict(self):
+        """Removes least recently used entries until under max_size."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_size:
+                    break
+                for victim in (path, path[:-len('.body')] + '.json'):
+                    try:
+                        os.remove(victim)
+                    except OSError:
+                        pass
+                total -= size
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import datetime
+import collections
+
+from . import utils
+from .exceptions import AudioNotAvailable
+
+
+Program = collections.namedtuple('Program', ['name', 'feed'])
+
+PROGRAMS = collections.OrderedDict([
+    ('morning_edition', Program('Morning Edition', 'http://www.npr.org/rss/rss.php?id=3')),
+    ('all_things_considered', Program('All Things Considered', 'http://www.npr.org/rss/rss.php?id=2')),
+    ('weekend_edition_saturday', Program('Weekend Edition Saturday', 'http://www.npr.org/rss/rss.php?id=7')),
+    ('weekend_edition_sunday', Program('Weekend Edition Sunday', 'http://www.npr.org/rss/rss.php?id=10')),
+    ('fresh_air', Program('Fresh Air', 'https://feeds.npr.org/381444908/podcast.xml')),
+    ('wait_wait', Program("Wait Wait... Don't Tell Me!", 'https://feeds.npr.org/344098539/podcast.xml')),
+    ('planet_money', Program('Planet Money', 'https://feeds.npr.org/510289/podcast.xml')),
+    ('up_first', Program('Up First', 'https://feeds.npr.org/510318/podcast.xml')),
+])
+
+DEFAULT_SUBSCRIPTIONS = ['morning_edition', 'weekend_edition_saturday', 'weekend_edition_sunday']
+
+# Program feeds reaching further back than the ones above, tried when no
+# recent edition has audio.
+ARCHIVES = {
+    'morning_edition': 'https://feeds.npr.org/3/rss.xml',
+    'weekend_edition_saturday': 'https://feeds.npr.org/7/rss.xml',
+    'weekend_edition_sunday': 'https://feeds.npr.org/10/rss.xml',
+}
+
+# Earlier editions in a program's own feed are only worth falling back to
+# within this; last week's Weekend Edition loses to yesterday's Morning Edition.
+MAX_EDITION_AGE = datetime.timedelta(days=6)
+
+_OLDEST = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+
+def config_dir(*parts):
+    """Returns path under the nprcli config directory, honoring XDG_CONFIG_HOME."""
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'nprcli', *parts)
+
+
+def program_for(day):
+    """Returns the name of the morning program NPR airs on the given date."""
+    weekday = day.weekday()
+    if weekday == 5:
+        return 'weekend_edition_saturday'
+    if weekday == 6:
+        return 'weekend_edition_sunday'
+    return 'morning_edition'
+
+def recent_programs(today=None, days=3):
+    """Returns programs for today and the days before it, most recent first, without repeats."""
+    today = today or datetime.date.today()
+    programs = []
+    for n in range(days):
+        program = program_for(today - datetime.timedelta(days=n))
+        if program not in programs:
+            programs.append(program)
+    return programs
+
+def find_playable_show(programs=None, today=None, probe=3, client=None, index=None, archives=None):
+    """Returns a Show for the most recent edition that already has audio.
+
+    Tries today's program first, then the previous days' programs, unless
+    programs lists the candidates in order of preference. Within each
+    program's feed the newest edition with audio wins, going back up to
+    MAX_EDITION_AGE, so on a weekday morning before the audio is posted
+    this is the previous Morning Edition. Every candidate is probed at once
+    with Show.playable_edition(), so falling back costs one round of
+    concurrent fetches rather than a sequence of failures. If none has
+    audio, the programs' ARCHIVES feeds are tried, at any age.
+
+    Raises AudioNotAvailable if nothing has audio, or the fetch error, e.g.
+    NetworkError, if no feed could be checked at all.
+    """
+    from .models import Show
+    today = today or datetime.date.today()
+    programs = programs or recent_programs(today)
+    archives = ARCHIVES if archives is None else archives
+    shows = [Show(program=p, client=client, index=index) for p in programs]
+    show, errors = _first_playable(shows, probe, today - MAX_EDITION_AGE)
+    if show is not None:
+        return show
+    older = [Show(program=p, feed=archives[p], client=client, index=index)
+             for p in programs if p in archives]
+    show, more = _first_playable(older, probe, None)
+    if show is not None:
+        return show
+    errors += more
+    if errors and len(errors) == len(shows) + len(older):
+        raise errors[0]
+    raise AudioNotAvailable
+
+def _first_playable(shows, probe, since):
+    """Returns the first of shows with a playable edition, narrowed to it, and the fetch errors."""
+    if not shows:
+        return None, []
+    results = utils.map_concurrently(lambda show: show.playable_edition(probe, since),
+                                     shows, len(shows))
+    errors = []
+    for show, (edition, error) in zip(shows, results):
+        if error is None:
+            show.edition = edition
+            utils.invalidate(show)
+            return show, errors
+        if not isinstance(error, AudioNotAvailable):
+            errors.append(error)
+    return None, errors
+
+
+class Catalog(object):
+    """The NPR programs a user subscribes to, refreshed together.
+
+    Subscriptions are program names from PROGRAMS, or feed URLs for anything
+    else, and persist in subscriptions.json in the config directory.
+    refresh() fetches every subscribed feed at once, on a thread and a
+    connection each unless workers says otherwise, so it takes about as
+    long as the slowest feed. Each feed is cached on its own by the HTTP
+    cache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.path = kwargs.get('path', None) or config_dir('subscriptions.json')
+        self.client = kwargs.get('client', None)
+        self.index = kwargs.get('index', None)
+        self.workers = kwargs.get('workers', None)
+        self.subscriptions = kwargs.get('subscriptions', None)
+        if self.subscriptions is None:
+            self.subscriptions = self.load()
+        self.shows = collections.OrderedDict()
+        self.failures = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return list(DEFAULT_SUBSCRIPTIONS)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.subscriptions, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def subscribe(self, program):
+        if program not in PROGRAMS and '://' not in program:
+            raise KeyError(program)
+        if program not in self.subscriptions:
+            self.subscriptions.append(program)
+
+    def unsubscribe(self, program):
+        if program in self.subscriptions:
+            self.subscriptions.remove(program)
+
+    def feed_for(self, program):
+        if program in PROGRAMS:
+            return PROGRAMS[program].feed
+        return program
+
+    def show(self, program):
+        from .models import Show
+        return Show(feed=self.feed_for(program), program=program,
+                    client=self.client, index=self.index)
+
+    def refresh(self):
+        """Fetches and parses every subscribed feed concurrently.
+
+        Returns dict of program -> Show for those that succeeded; the errors
+        of the rest are in self.failures.
+        """
+        from .client import get_client
+        shows = [self.show(p) for p in self.subscriptions]
+        workers = self.workers or max(1, len(shows))
+        (self.client or get_client()).reserve(workers)
+        results = utils.map_concurrently(lambda show: show.episodes, shows, workers)
+        self.shows = collections.OrderedDict()
+        self.failures = {}
+        for program, show, (_, error) in zip(self.subscriptions, shows, results):
+            if error is None:
+                self.shows[program] = show
+            else:
+                self.failures[program] = error
+        return self.shows
+
+    def episodes(self):
+        """Returns the episodes of every refreshed show, newest first."""
+        if not self.shows:
+            self.refresh()
+        merged = [e for show in self.shows.values() for e in show.episodes]
+        merged.sort(key=lambda e: e.published or _OLDEST, reverse=True)
+        return merged
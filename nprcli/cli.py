@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='npr', description='Command-line NPR podcast player.')
+    parser.add_argument('--profile', action='store_true',
+                        help='print time, bytes and cache hits per network and parse step on exit')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='like --profile, and also write a trace-event JSON file for chrome://tracing')
+    commands = parser.add_subparsers(dest='command')
+
+    play = commands.add_parser('play', help='play the newest show (default)')
+    play.add_argument('--library', metavar='DIR',
+                      help='play a show synced with `npr sync` from DIR, offline')
+    play.add_argument('--program', help="program to play, e.g. fresh_air (default: today's show)")
+    play.add_argument('--refresh', type=float, default=5, metavar='MINUTES',
+                      help='check the feed for new stories this often, 0 to never (default: 5)')
+    play.add_argument('--compact', action='store_true',
+                      help='convert prefetched audio to low-bitrate mono with ffmpeg, and play that')
+    play.add_argument('--no-resume', dest='resume', action='store_false',
+                      help='start from the first episode, not where the last run of the show stopped')
+
+    daemon = commands.add_parser('daemon', help='play in the background, controlled by the commands below')
+    daemon.add_argument('--library', metavar='DIR', help='as for play')
+    daemon.add_argument('--program', help='as for play')
+    daemon.add_argument('--refresh', type=float, default=5, metavar='MINUTES',
+                        help='check the feed and subscriptions for new stories this often, 0 to never')
+    daemon.add_argument('--compact', action='store_true', help='as for play')
+    daemon.add_argument('--no-resume', dest='resume', action='store_false', help='as for play')
+
+    commands.add_parser('next', help='skip to the next episode in the running daemon')
+    commands.add_parser('previous', help='go back one episode in the running daemon')
+    commands.add_parser('stop', help='stop the running daemon')
+    status = commands.add_parser('status', help="show the running daemon's now-playing state")
+    status.add_argument('--json', action='store_true', help='print the state as JSON, e.g. for status bars')
+    queue = commands.add_parser('queue', help="add stories to the running daemon's playlist")
+    queue.add_argument('urls', nargs='+', metavar='URL', help='article page URLs')
+
+    catalog = commands.add_parser('catalog', help='list programs and manage subscriptions')
+    catalog.add_argument('--subscribe', action='append', default=[], metavar='PROGRAM',
+                         help='subscribe to a program name or feed URL')
+    catalog.add_argument('--unsubscribe', action='append', default=[], metavar='PROGRAM')
+
+    latest = commands.add_parser('latest', help='refresh subscriptions and list newest episodes')
+    latest.add_argument('-n', type=int, default=20, help='number of episodes to list')
+
+    search = commands.add_parser('search', help='search stories from every feed seen so far')
+    search.add_argument('terms', nargs='+', metavar='TERM')
+    search.add_argument('-n', type=int, default=20, help='maximum number of results')
+    search.add_argument('--refresh', action='store_true',
+                        help='refresh subscriptions first, to include their newest stories')
+    search.add_argument('--play', action='store_true', help='play the results as a playlist')
+    search.add_argument('--queue', action='store_true',
+                        help="add the results to the running daemon's playlist")
+
+    sync = commands.add_parser('sync', help='download whole shows for offline playback')
+    sync.add_argument('programs', nargs='*', metavar='PROGRAM',
+                      help="programs to sync, e.g. morning_edition (default: today's show)")
+    sync.add_argument('-d', '--dest', default=os.path.join(os.path.expanduser('~'), 'npr'),
+                      help='directory to sync into, one subdirectory per program')
+    sync.add_argument('-j', '--workers', type=int, default=4,
+                      help='maximum concurrent downloads across all programs')
+    sync.add_argument('--rate', type=float, metavar='KB/S',
+                      help='maximum combined download rate')
+    sync.add_argument('--compact', action='store_true',
+                      help='keep only low-bitrate mono copies, converted with ffmpeg as downloads finish')
+
+    index = commands.add_parser('index', help='inspect or prune the episode metadata index')
+    index.add_argument('--prune', action='store_true',
+                       help='remove entries that are due for revalidation')
+    index.add_argument('--older-than', type=float, metavar='DAYS',
+                       help='with --prune, remove entries checked more than DAYS ago')
+    index.add_argument('--clear', action='store_true', help='remove every entry')
+
+    args = parser.parse_args(argv)
+    handlers = {
+        'index': cmd_index,
+        'sync': cmd_sync,
+        'catalog': cmd_catalog,
+        'latest': cmd_latest,
+        'search': cmd_search,
+        'daemon': cmd_daemon,
+        'next': cmd_control,
+        'previous': cmd_control,
+        'stop': cmd_control,
+        'status': cmd_status,
+        'queue': cmd_queue,
+    }
+    handler = handlers.get(args.command, cmd_play)
+    if not (args.profile or args.trace):
+        return handler(args)
+    from .trace import tracer
+    tracer.enable()
+    try:
+        return handler(args)
+    finally:
+        tracer.report(args.trace)
+
+def _show(args):
+    from .models import Show
+    from .catalog import PROGRAMS, find_playable_show
+    library = getattr(args, 'library', None)
+    program = getattr(args, 'program', None)
+    if program and program not in PROGRAMS:
+        print("Unknown program {}; choose from: {}".format(program, ', '.join(PROGRAMS)))
+        raise SystemExit(2)
+    if library or program:
+        return Show(library=library, program=program)
+    from .exceptions import AudioNotAvailable, NetworkError
+    try:
+        return find_playable_show()
+    except (AudioNotAvailable, NetworkError) as e:
+        print(e)
+        raise SystemExit(1)
+
+def _refresh(args):
+    # Bare `npr` refreshes as often as `npr play` does by default.
+    minutes = getattr(args, 'refresh', 5)
+    return minutes * 60 if minutes else None
+
+def _transcoder(args, **kwargs):
+    if not getattr(args, 'compact', False):
+        return None
+    from .transcode import Transcoder
+    transcoder = Transcoder(**kwargs)
+    if not transcoder.available:
+        print("--compact needs ffmpeg, which was not found on PATH.")
+        raise SystemExit(2)
+    return transcoder
+
+def _resume(args):
+    # Bare `npr` plays with resume too.
+    if not getattr(args, 'resume', True):
+        return None
+    from .resume import Resume
+    return Resume()
+
+def cmd_play(args):
+    from .exceptions import AudioNotAvailable, NetworkError
+    from .models import Player
+    try:
+        player = Player(show=_show(args), refresh=_refresh(args), transcoder=_transcoder(args),
+                        resume=_resume(args))
+        player.play()
+    except (AudioNotAvailable, NetworkError) as e:
+        print(e)
+        return 1
+
+def cmd_daemon(args):
+    from .catalog import Catalog
+    from .daemon import Daemon
+    from .models import Player
+    daemon = Daemon(player=None)
+    daemon.bind()
+    try:
+        show = _show(args)
+        catalog = Catalog()
+        subscriptions = [catalog.show(p) for p in catalog.subscriptions
+                         if catalog.feed_for(p) != show.feed]
+        daemon.player = Player(show=show, verbose=False, stdin=open(os.devnull, 'rb'),
+                               refresh=_refresh(args), refresh_shows=subscriptions,
+                               transcoder=_transcoder(args), resume=_resume(args))
+        print("Listening on {}".format(daemon.path))
+        daemon.serve()
+    finally:
+        daemon.close()
+
+def _send(command, *args):
+    from .daemon import send
+    from .exceptions import DaemonError
+    try:
+        return send(command, *args)
+    except DaemonError as e:
+        print(e)
+        raise SystemExit(1)
+
+def _print_status(state):
+    now = state['now_playing']
+    print(state['show'])
+    if now:
+        title = " - ".join(f for f in (now['program'], now['title']) if f)
+        print("{:>3}. {}".format(state['position'] + 1, title))
+
+def cmd_control(args):
+    command = 'quit' if args.command == 'stop' else args.command
+    state = _send(command)
+    if state:
+        _print_status(state)
+
+def cmd_status(args):
+    state = _send('status')
+    if args.json:
+        import json
+        print(json.dumps(state))
+    else:
+        _print_status(state)
+
+def cmd_queue(args):
+    result = _send('queue', *args.urls)
+    for url in result['queued']:
+        print("Queued {}".format(url))
+    for url, error in result['failed'].items():
+        print("Could not queue {}: {}".format(url, error))
+    return 1 if result['failed'] else None
+
+def cmd_catalog(args):
+    from .catalog import Catalog, PROGRAMS
+    catalog = Catalog()
+    try:
+        for program in args.subscribe:
+            catalog.subscribe(program)
+    except KeyError as e:
+        print("Unknown program {}; choose from: {}".format(e.args[0], ', '.join(PROGRAMS)))
+        return 2
+    for program in args.unsubscribe:
+        catalog.unsubscribe(program)
+    if args.subscribe or args.unsubscribe:
+        catalog.save()
+    for name, program in PROGRAMS.items():
+        mark = '*' if name in catalog.subscriptions else ' '
+        print("{} {:<26} {}".format(mark, name, program.name))
+    for feed in catalog.subscriptions:
+        if feed not in PROGRAMS:
+            print("* {}".format(feed))
+
+def cmd_latest(args):
+    from .catalog import Catalog
+    catalog = Catalog()
+    catalog.refresh()
+    for program, error in catalog.failures.items():
+        print("Could not refresh {}: {}".format(program, error))
+    for episode in catalog.episodes()[:args.n]:
+        when = episode.published.strftime('%Y-%m-%d %H:%M') if episode.published else '?'
+        print("{}  {} - {}".format(when, episode.program, episode.title))
+
+def cmd_search(args):
+    import datetime
+    from .index import get_index
+    if args.refresh:
+        from .catalog import Catalog
+        catalog = Catalog()
+        catalog.refresh()
+        for program, error in catalog.failures.items():
+            print("Could not refresh {}: {}".format(program, error))
+    terms = ' '.join(args.terms)
+    results = get_index().search(terms, limit=args.n)
+    if not results:
+        print("No stories match {!r}.".format(terms))
+        return 1
+    if args.queue:
+        return cmd_queue(argparse.Namespace(urls=[r['url'] for r in results]))
+    if not args.play:
+        for n, r in enumerate(results, 1):
+            when = r['published'][:10] if r['published'] else r['date'] or '?'
+            print("{:>3}. {}  {} - {}".format(n, when, r['program'], r['title']))
+            print("     {}".format(r['url']))
+        return
+    from .models import Episode, Player, Show
+    episodes = []
+    for r in results:
+        published = datetime.datetime.fromisoformat(r['published']) if r['published'] else None
+        episodes.append(Episode(r['url'], title=r['title'], program=r['program'],
+                                date=r['date'], mp3=r['mp3'], published=published))
+    Player(show=Show.of(episodes, "Search: {}".format(terms))).play()
+
+def cmd_sync(args):
+    from .catalog import PROGRAMS
+    from .models import Show
+    from .sync import Sync
+    today = Show()
+    programs = args.programs or [p for p, feed in today.feeds.items() if feed == today.feed]
+    shows = {}
+    for program in programs:
+        if program not in PROGRAMS:
+            print("Unknown program {}; choose from: {}".format(program, ', '.join(PROGRAMS)))
+            return 2
+        shows[os.path.join(args.dest, program)] = Show(program=program)
+    rate = args.rate * 1024 if args.rate else None
+    transcoder = _transcoder(args, keep_original=False)
+    try:
+        results = Sync(workers=args.workers, rate=rate, transcoder=transcoder).run(shows)
+    finally:
+        if transcoder is not None:
+            transcoder.close()
+    for directory, manifest in results.items():
+        print("{}: {} episodes in {}".format(manifest['title'], len(manifest['episodes']), directory))
+
+def cmd_index(args):
+    from .index import get_index
+    index = get_index()
+    if args.clear:
+        print("Removed {} entries.".format(index.clear()))
+    elif args.prune:
+        older_than = args.older_than * 24 * 60 * 60 if args.older_than is not None else None
+        print("Removed {} entries.".format(index.prune(older_than)))
+    else:
+        now = time.time()
+        for e in index.entries():
+            flags = 'stale' if index.is_stale(e, now) else ''
+            audio = 'audio' if e['mp3'] else 'no audio'
+            print("{} ({}) - {} [{}] {}".format(e['program'], e['date'], e['title'], audio, flags).rstrip())
+            print("    {}".format(e['url']))
+        print("{} entries in {}".format(len(index), index.path))
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+from contextlib import closing
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import trace
+from .cache import HTTPCache
+from .exceptions import NetworkError
+
+try:
+    from urllib.parse import urlsplit, urlunsplit
+except ImportError:
+    from urlparse import urlsplit, urlunsplit
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _chunks(body, size):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+class Client(object):
+    """Shared HTTP layer that every fetch in nprcli goes through.
+
+    Wraps a single requests.Session so connections to npr.org are kept alive
+    and reused. pool_maxsize caps the number of connections per host, and
+    failed requests are retried with exponential backoff. If given an
+    HTTPCache, fetch() serves and revalidates bodies from disk.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.timeout = kwargs.get('timeout', (5, 30))
+        self.hosts = kwargs.get('hosts', {})
+        self.cache = kwargs.get('cache', None)
+        self.pool_maxsize = kwargs.get('pool_maxsize', 8)
+        self._pool = dict(pool_connections=kwargs.get('pool_connections', 4),
+                          retries=kwargs.get('retries', 3),
+                          backoff_factor=kwargs.get('backoff_factor', 0.5))
+        self._own_session = kwargs.get('session', None) is None
+        self.session = kwargs.get('session', None) or self._build_session(
+            pool_maxsize=self.pool_maxsize, **self._pool)
+        self._reserve_lock = threading.Lock()
+
+    def _build_session(self, pool_connections, pool_maxsize, retries, backoff_factor):
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=('GET', 'HEAD'),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=True,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def reserve(self, connections):
+        """Makes room for at least that many connections per host at once.
+
+        Call before starting that many concurrent requests, since requests
+        beyond pool_maxsize wait for a free connection. If the pool has to
+        grow, a new session replaces the old one, which requests already in
+        flight finish on.
+        """
+        with self._reserve_lock:
+            if not self._own_session or connections <= self.pool_maxsize:
+                return
+            self.pool_maxsize = connections
+            self.session = self._build_session(pool_maxsize=connections, **self._pool)
+
+    def rewrite(self, url):
+        """Points URLs for hosts listed in self.hosts at their replacement.
+
+        Lets tests redirect npr.org traffic to a local stand-in server, e.g.
+        Client(hosts={'www.npr.org': 'http://127.0.0.1:8000'}).
+        """
+        parts = urlsplit(url)
+        target = self.hosts.get(parts.netloc)
+        if not target:
+            return url
+        target = urlsplit(target)
+        return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.rewrite(url), **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('HEAD', url, **kwargs)
+
+    def fetch(self, url, ttl=None, **kwargs):
+        """Returns body of URL as bytes, raising NetworkError on any failure.
+
+        With a cache and a ttl (in seconds), a cached body younger than ttl is
+        returned without touching the network. Older entries are revalidated
+        with a conditional GET, and still served if npr.org is unreachable.
+        """
+        return b''.join(self.iter_fetch(url, ttl=ttl, **kwargs))
+
+    def iter_fetch(self, url, ttl=None, chunk_size=CHUNK_SIZE, **kwargs):
+        """Like fetch(), but yields the body in chunks as it arrives.
+
+        When tracing, the request up to the response headers is recorded as an
+        http.request span, and the body as an http.body span with its size;
+        the body span runs until the last chunk, so it includes time the
+        caller spends on each chunk.
+        """
+        cached = None
+        if self.cache is not None and ttl is not None:
+            cached = self.cache.get(url)
+        if cached:
+            meta, body = cached
+            if self.cache.is_fresh(meta, ttl):
+                trace.count('cache.hit')
+                trace.count('cache.bytes', len(body))
+                for chunk in _chunks(body, chunk_size):
+                    yield chunk
+                return
+            headers = dict(kwargs.pop('headers', {}), **self.cache.validators(meta))
+            kwargs['headers'] = headers
+        elif self.cache is not None and ttl is not None:
+            trace.count('cache.miss')
+        with trace.span('http.request', url=url) as attrs:
+            try:
+                r = self.get(url, stream=True, **kwargs)
+            except requests.RequestException:
+                r = None
+            attrs['status'] = r.status_code if r is not None else None
+        if r is None or not (r.ok or (cached and r.status_code == 304)):
+            if r is not None:
+                r.close()
+            if not cached:
+                raise NetworkError
+            trace.count('cache.stale')
+            for chunk in _chunks(cached[1], chunk_size):
+                yield chunk
+            return
+        with closing(r):
+            if r.status_code == 304:
+                trace.count('cache.revalidated')
+                self.cache.touch(url, cached[0])
+                for chunk in _chunks(cached[1], chunk_size):
+                    yield chunk
+                return
+            parts = []
+            start = time.perf_counter()
+            size = 0
+            try:
+                for chunk in r.iter_content(chunk_size):
+                    parts.append(chunk)
+                    size += len(chunk)
+                    yield chunk
+            except requests.RequestException:
+                raise NetworkError
+            finally:
+                trace.record('http.body', start, time.perf_counter() - start, url=url, bytes=size)
+                trace.count('http.bytes', size)
+        if self.cache is not None and ttl is not None:
+            self.cache.store(url, b''.join(parts), r.headers)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide Client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Client(cache=HTTPCache())
+        return _client
+
+def set_client(client):
+    """Replaces the process-wide Client, returning the previous one."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import socket
+import threading
+
+from .cache import cache_dir
+from .exceptions import DaemonError
+
+
+# largest request or reply accepted on the control socket, in bytes
+MAX_MESSAGE = 1024 * 1024
+
+
+def socket_path():
+    """Returns where the daemon listens, preferring XDG_RUNTIME_DIR."""
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'nprcli.sock')
+    return cache_dir('daemon.sock')
+
+def _read_message(conn):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(64 * 1024)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_MESSAGE:
+            raise ValueError('message too large')
+    return json.loads(data.decode('utf-8'))
+
+def send(command, *args, **kwargs):
+    """Sends command to the running daemon and returns its result.
+
+    Messages are one line of JSON each way: {"command": ..., "args": [...]}
+    answered by {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+    Raises DaemonError if no daemon is listening or the command fails.
+    """
+    path = kwargs.get('path', None) or socket_path()
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(kwargs.get('timeout', 30))
+    try:
+        try:
+            conn.connect(path)
+        except (OSError, socket.error):
+            raise DaemonError("no daemon listening on {}; start one with `npr daemon`".format(path))
+        conn.sendall(json.dumps({'command': command, 'args': list(args)}).encode('utf-8') + b'\n')
+        reply = _read_message(conn)
+    except (OSError, ValueError) as e:
+        raise DaemonError(str(e))
+    finally:
+        conn.close()
+    if not reply.get('ok'):
+        raise DaemonError(reply.get('error'))
+    return reply.get('result')
+
+
+def _error(e):
+    return {'ok': False, 'error': str(e) or e.__class__.__name__}
+
+
+class Daemon(object):
+    """Serves a Player to thin clients over a UNIX socket.
+
+    The socket is watched by the Player's own event loop, so commands run
+    on the same thread as keypresses and backend events, one connection at
+    a time; each connection carries a single request, see send(). Commands
+    in self.background may fetch pages, so they run on a worker thread and
+    return a function that finishes them on the event loop, woken through a
+    pipe as with a Refresher; their client is answered then.
+    """
+
+    def __init__(self, player, *args, **kwargs):
+        self.player = player
+        self.path = kwargs.get('path', None) or socket_path()
+        self.sock = None
+        self.stopping = False
+        self._finished = []
+        self._lock = threading.Lock()
+        self._r = self._w = None
+        self.commands = {
+            'status': self.status,
+            'next': self.next,
+            'previous': self.previous,
+            'jump': self.jump,
+            'shuffle': self.shuffle,
+            'playlist': self.playlist,
+            'quit': self.quit,
+        }
+        self.background = {
+            'queue': self.queue,
+        }
+
+    def bind(self):
+        """Listens on self.path, replacing a socket left behind by a dead daemon."""
+        if os.path.exists(self.path):
+            try:
+                send('status', path=self.path, timeout=1)
+            except DaemonError:
+                os.unlink(self.path)
+            else:
+                raise DaemonError("a daemon is already listening on {}".format(self.path))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.sock.listen(16)
+        self.sock.setblocking(False)
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+
+    def serve(self):
+        """Starts playback and handles commands until the player quits."""
+        if self.sock is None:
+            self.bind()
+        try:
+            self.player.play(watches={self.sock.fileno(): self.accept, self._r: self.finish})
+        finally:
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        for fd in (self._r, self._w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._r = self._w = None
+
+    def accept(self):
+        """Answers one pending connection; never stops the event loop."""
+        try:
+            conn, _ = self.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return False
+        conn.settimeout(5)
+        try:
+            request = _read_message(conn)
+            command, args = request.get('command'), request.get('args', [])
+            if command in self.background:
+                worker = threading.Thread(target=self._work, args=(conn, self.background[command], args),
+                                          name='nprcli-daemon-' + command)
+                worker.daemon = True
+                worker.start()
+                return False
+            handler = self.commands.get(command)
+            if handler is None:
+                raise ValueError("unknown command {!r}".format(command))
+            reply = {'ok': True, 'result': handler(*args)}
+        except Exception as e:
+            reply = _error(e)
+        self._reply(conn, reply)
+        if self.stopping:
+            self.player.quit()
+        return False
+
+    def _work(self, conn, handler, args):
+        try:
+            finish = handler(*args)
+        except Exception as e:
+            finish = e
+        with self._lock:
+            self._finished.append((conn, finish))
+        try:
+            os.write(self._w, b'.')
+        except (OSError, TypeError):
+            conn.close()
+
+    def finish(self):
+        """Completes background commands on the event loop and answers their clients."""
+        try:
+            os.read(self._r, 1024)
+        except OSError:
+            pass
+        with self._lock:
+            finished, self._finished = self._finished, []
+        for conn, finish in finished:
+            try:
+                if isinstance(finish, Exception):
+                    raise finish
+                reply = {'ok': True, 'result': finish()}
+            except Exception as e:
+                reply = _error(e)
+            self._reply(conn, reply)
+        return False
+
+    def _reply(self, conn, reply):
+        with conn:
+            try:
+                conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+
+    def _describe(self, episode):
+        # Only what's already known, so status never waits on the network.
+        return dict(episode.known_fields(), url=episode.url)
+
+    def status(self):
+        player = self.player
+        playlist = player.playlist
+        now = player.now_playing
+        return {
+            'pid': os.getpid(),
+            'show': str(player.show),
+            'now_playing': self._describe(now) if now is not None else None,
+            'position': playlist.cursor,
+            'loaded': len(playlist),
+            'complete': playlist.exhausted,
+        }
+
+    def next(self):
+        self.player.next_track()
+        return self.status()
+
+    def previous(self):
+        self.player.previous_track()
+        return self.status()
+
+    def jump(self, n):
+        self.player.jump(int(n))
+        return self.status()
+
+    def shuffle(self):
+        self.player.shuffle()
+        return self.status()
+
+    def queue(self, *urls):
+        """Adds episodes after those already in the playlist, skipping ones without audio.
+
+        Runs in the background: resolves the episodes, then returns the
+        function that appends them on the event loop.
+        """
+        from .models import Episode
+        from .utils import map_concurrently
+        show = self.player.show
+        episodes = [Episode(url, client=show.client, index=show.index) for url in urls]
+        results = map_concurrently(Episode.resolve, episodes, workers=show.workers)
+        def append():
+            queued, failed = [], {}
+            for episode, (_, error) in zip(episodes, results):
+                if error is None:
+                    self.player.playlist.append(episode)
+                    queued.append(episode.url)
+                else:
+                    failed[episode.url] = str(error)
+            if queued and self.player.now_playing is not None and self.player.preloaded is None:
+                self.player.preload_next()
+            return {'queued': queued, 'failed': failed}
+        return append
+
+    def playlist(self):
+        playlist = self.player.playlist
+        return {'position': playlist.cursor,
+                'episodes': [self._describe(e) for e in playlist[:len(playlist)]]}
+
+    def quit(self):
+        # accept() replies before quitting, since Player.quit() ends the process.
+        self.stopping = True
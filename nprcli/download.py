@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import hashlib
+import threading
+
+import requests
+
+from .client import get_client
+from .exceptions import DownloadError
+
+
+class DownloadResult(object):
+    """Outcome of a completed download."""
+
+    def __init__(self, path, size, elapsed, resumed_from=0, segments=1):
+        self.path = path
+        self.size = size
+        self.elapsed = elapsed
+        self.resumed_from = resumed_from
+        self.segments = segments
+
+    @property
+    def throughput(self):
+        """Bytes per second transferred by this download, not counting resumed bytes."""
+        if not self.elapsed:
+            return 0.0
+        return (self.size - self.resumed_from) / self.elapsed
+
+    def __str__(self):
+        return "{} ({:.1f} MB, {:.1f} KB/s)".format(
+            self.path, self.size / 1048576.0, self.throughput / 1024.0)
+
+
+class Downloader(object):
+    """Downloads large files such as episode MP3s to disk.
+
+    Data is written through a large buffer to path + '.part' and renamed into
+    place once complete and verified. An existing .part file is resumed with an
+    HTTP Range request. With segments > 1, files big enough are fetched as that
+    many byte ranges over parallel connections; progress of each range is kept
+    in a .part.json sidecar so they resume too. A .part file is pre-allocated
+    for ranges only once its sidecar exists, so one with a sidecar is never
+    resumed as a stream. A Throttle, which may be shared between Downloaders,
+    caps the bandwidth used.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.client = kwargs.get('client', None) or get_client()
+        self.chunk_size = kwargs.get('chunk_size', 64 * 1024)
+        self.buffer_size = kwargs.get('buffer_size', 1024 * 1024)
+        self.segments = kwargs.get('segments', 1)
+        self.min_segment_size = kwargs.get('min_segment_size', 4 * 1024 * 1024)
+        self.progress = kwargs.get('progress', None)
+        self.throttle = kwargs.get('throttle', None)
+
+    def download(self, url, path, expected_size=None, checksum=None, cancel=None):
+        """Downloads url to path, returning a DownloadResult.
+
+        checksum is an 'algorithm:hexdigest' string, e.g. 'sha256:ab12...'.
+        Raises DownloadError if the transfer fails or the result doesn't match
+        expected_size or checksum. Returns None if cancel is set first, leaving
+        the .part file behind so a later call can resume it.
+        """
+        partial = path + '.part'
+        start = time.time()
+        progress = _Progress(self.progress, self.throttle)
+
+        size, ranges = None, False
+        segmented = os.path.exists(partial + '.json')
+        if self.segments > 1 or segmented:
+            size, ranges = self._probe(url)
+        if ranges and size and (segmented or size >= self.min_segment_size * self.segments):
+            resumed_from, segments = self._fetch_segments(url, partial, size, progress, cancel)
+        else:
+            if segmented:
+                # Pre-allocated for ranges this server no longer serves; its
+                # length says nothing about how much of it was written.
+                _remove(partial, partial + '.json')
+            (resumed_from, size), segments = self._fetch_stream(url, partial, progress, cancel), 1
+        if cancel is not None and cancel.is_set():
+            return None
+
+        actual = os.path.getsize(partial)
+        if size is not None and actual != size:
+            _remove(partial)
+            raise DownloadError("server sent {} bytes of {}".format(actual, size))
+        if expected_size is not None and actual != expected_size:
+            os.remove(partial)
+            raise DownloadError("expected {} bytes, got {}".format(expected_size, actual))
+        if checksum:
+            algorithm, _, expected = checksum.partition(':')
+            digest = file_digest(partial, algorithm)
+            if digest != expected.lower():
+                os.remove(partial)
+                raise DownloadError("{} mismatch for {}".format(algorithm, url))
+        os.replace(partial, path)
+        return DownloadResult(path, actual, time.time() - start, resumed_from, segments)
+
+    def _probe(self, url):
+        """Returns (size, supports ranges) for url, from a HEAD request."""
+        try:
+            r = self.client.head(url)
+        except requests.RequestException as e:
+            raise DownloadError(e)
+        if not r.ok:
+            raise DownloadError("HTTP {}".format(r.status_code))
+        length = r.headers.get('Content-Length')
+        return (int(length) if length else None,
+                r.headers.get('Accept-Ranges', '').lower() == 'bytes')
+
+    def _fetch_stream(self, url, partial, progress, cancel):
+        """Streams url into partial, resuming from its current size.
+
+        Returns (resumed offset, size of the whole file or None if unknown).
+        """
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+        try:
+            r = self.client.get(url, stream=True, headers=headers)
+        except requests.RequestException as e:
+            raise DownloadError(e)
+        with r:
+            if offset and r.status_code == 416:
+                # Only complete if the server says the file is exactly that long.
+                total = r.headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit() and int(total) == offset:
+                    return offset, offset
+                _remove(partial)
+                return self._fetch_stream(url, partial, progress, cancel)
+            if not r.ok:
+                raise DownloadError("HTTP {}".format(r.status_code))
+            if r.status_code != 206:
+                offset = 0
+            length = r.headers.get('Content-Length')
+            progress.total = offset + int(length) if length else None
+            progress.done = offset
+            if 'gzip' in r.headers.get('Content-Encoding', ''):
+                progress.total = None  # Content-Length counts compressed bytes
+            with open(partial, 'ab' if offset else 'wb', buffering=self.buffer_size) as f:
+                try:
+                    for chunk in r.iter_content(self.chunk_size):
+                        if cancel is not None and cancel.is_set():
+                            break
+                        f.write(chunk)
+                        progress.add(len(chunk))
+                except requests.RequestException as e:
+                    raise DownloadError(e)
+        if cancel is not None and cancel.is_set():
+            return offset, None
+        return offset, progress.total
+
+    def _fetch_segments(self, url, partial, size, progress, cancel):
+        """Fetches url as parallel byte ranges into partial. Returns (resumed bytes, segments)."""
+        state_path = partial + '.json'
+        state = None
+        if os.path.exists(partial) and os.path.exists(state_path):
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+            except ValueError:
+                state = None
+        if not state or state.get('size') != size:
+            count = max(1, self.segments)
+            step = -(-size // count)
+            state = {'size': size, 'segments': [[s, min(s + step, size), 0]
+                                                for s in range(0, size, step)]}
+            # The sidecar goes first, so a crash never leaves a pre-allocated
+            # file that looks like a finished stream.
+            _write_state(state_path, state)
+            with open(partial, 'wb') as f:
+                f.truncate(size)
+        segments = state['segments']
+        state_lock = threading.Lock()
+        resumed_from = sum(done for _, _, done in segments)
+        progress.total, progress.done = size, resumed_from
+
+        errors = []
+        def fetch(segment):
+            begin, end, done = segment
+            if begin + done >= end:
+                return
+            headers = {'Range': 'bytes={}-{}'.format(begin + done, end - 1)}
+            try:
+                r = self.client.get(url, stream=True, headers=headers)
+                with r, open(partial, 'r+b', buffering=self.buffer_size) as f:
+                    if r.status_code != 206:
+                        raise DownloadError("server ignored range request")
+                    f.seek(begin + done)
+                    for chunk in r.iter_content(self.chunk_size):
+                        if cancel is not None and cancel.is_set():
+                            return
+                        chunk = chunk[:end - begin - segment[2]]
+                        f.write(chunk)
+                        segment[2] += len(chunk)
+                        progress.add(len(chunk))
+                # Recorded once the data is written, so it resumes after a crash.
+                with state_lock:
+                    _write_state(state_path, state)
+            except (requests.RequestException, DownloadError) as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch, args=(s,)) for s in segments]
+        try:
+            for t in threads:
+                t.start()
+        finally:
+            for t in threads:
+                t.join()
+        cancelled = cancel is not None and cancel.is_set()
+        if not errors and not cancelled and any(b + d < e for b, e, d in segments):
+            errors.append(DownloadError("connection closed before range was complete"))
+        if errors or cancelled:
+            _write_state(state_path, state)
+            if errors:
+                raise DownloadError(errors[0])
+        elif os.path.exists(state_path):
+            os.remove(state_path)
+        return resumed_from, len(segments)
+
+
+def _write_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Progress(object):
+    """Thread-safe byte counter that forwards to a progress(done, total) callback."""
+
+    def __init__(self, callback, throttle=None):
+        self.callback = callback
+        self.throttle = throttle
+        self.done = 0
+        self.total = None
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.done += n
+            done = self.done
+        if self.throttle:
+            self.throttle.consume(n)
+        if self.callback:
+            self.callback(done, self.total)
+
+
+class Throttle(object):
+    """Token bucket limiting the combined rate, in bytes per second, of its users."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst or max(rate, 64 * 1024)
+        self._tokens = self.burst
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def consume(self, n):
+        """Blocks until n bytes may be transferred."""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def file_digest(path, algorithm='sha256'):
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
@@ -13,3 +13,30 @@ class AudioNotAvailable(Exception):
 
     def __str__(self):
         return "Audio is not yet available for this show."
+
+class DownloadError(Exception):
+    def __init__(self, reason=None):
+        self.reason = reason
+
+    def __str__(self):
+        if self.reason:
+            return "Download failed: {}".format(self.reason)
+        return "Download failed."
+
+class DaemonError(Exception):
+    def __init__(self, reason=None):
+        self.reason = reason
+
+    def __str__(self):
+        if self.reason:
+            return "Daemon request failed: {}".format(self.reason)
+        return "Daemon request failed."
+
+class TranscodeError(Exception):
+    def __init__(self, reason=None):
+        self.reason = reason
+
+    def __str__(self):
+        if self.reason:
+            return "Transcode failed: {}".format(self.reason)
+        return "Transcode failed."
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+try:
+    from html.parser import HTMLParser
+except ImportError:
+    from HTMLParser import HTMLParser
+
+from . import trace
+
+
+# field name -> (tag, class) of the element it is read from
+TARGETS = {
+    'title': ('div', 'storytitle'),
+    'program': ('a', 'program'),
+    'date': ('span', 'date'),
+    'mp3': ('a', 'download'),
+}
+
+CHUNK_SIZE = 16 * 1024
+
+
+class _Done(Exception):
+    pass
+
+
+class _FieldParser(HTMLParser):
+    """Streaming tokenizer that collects the Episode fields from a story page.
+
+    Matches the same elements Episode used to find with BeautifulSoup: the
+    first element of each (tag, class) in TARGETS. Text fields collect all text
+    inside the element; mp3 takes the href of the download link. Raises _Done
+    as soon as every field is found, so the rest of the page is never tokenized.
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.fields = dict((name, None) for name in TARGETS)
+        self._open = []  # [name, tag, depth, text parts] for elements being read
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self._open:
+            if capture[1] == tag:
+                capture[2] += 1
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        for name, (target_tag, target_class) in TARGETS.items():
+            if tag != target_tag or self.fields[name] is not None:
+                continue
+            if any(c[0] == name for c in self._open):
+                continue
+            if target_class not in classes:
+                continue
+            if name == 'mp3':
+                if attrs.get('href') is not None:
+                    self.fields[name] = attrs['href'].strip()
+                    self._check_done()
+            else:
+                self._open.append([name, tag, 0, []])
+
+    def handle_endtag(self, tag):
+        for capture in list(self._open):
+            if capture[1] != tag:
+                continue
+            if capture[2]:
+                capture[2] -= 1
+                continue
+            self._open.remove(capture)
+            self.fields[capture[0]] = ''.join(capture[3]).strip()
+        self._check_done()
+
+    def handle_data(self, data):
+        for capture in self._open:
+            capture[3].append(data)
+
+    def _check_done(self):
+        if all(v is not None for v in self.fields.values()):
+            raise _Done
+
+
+def extract_fields(content, chunk_size=CHUNK_SIZE):
+    """Returns dict of title, program, date and mp3 found in a story page.
+
+    Missing fields are None. content may be bytes or text; the page is fed to
+    the tokenizer in chunks, and parsing stops once every field is found.
+    """
+    with trace.span('extract', bytes=len(content)):
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', 'replace')
+        parser = _FieldParser()
+        try:
+            for start in range(0, len(content), chunk_size):
+                parser.feed(content[start:start + chunk_size])
+            parser.close()
+        except _Done:
+            pass
+    return parser.fields
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from xml.etree.ElementTree import XMLPullParser
+
+from . import trace
+
+
+MEDIA_NS = '{http://search.yahoo.com/mrss/}'
+ITUNES_NS = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+
+# channel fields Show reads, and the item fields kept for each Episode
+CHANNEL_FIELDS = ('title', 'lastBuildDate', 'pubDate')
+ITEM_FIELDS = ('title', 'link', 'guid', 'pubDate', 'description')
+
+
+def parse_date(text):
+    """Returns RFC 822 date from a feed, e.g. pubDate, as an aware datetime, or None.
+
+    Dates without a usable zone, e.g. '-0000', are taken to be UTC.
+    """
+    if not text:
+        return None
+    try:
+        date = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+def parse_duration(text):
+    """Returns a duration such as '2280', '38:00' or '0:38:00' in seconds, or None."""
+    if not text:
+        return None
+    seconds = 0
+    try:
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + int(float(part))
+    except ValueError:
+        return None
+    return seconds
+
+def _audio_url(elem):
+    """Returns the URL of an <enclosure> or <media:content> element if it's audio."""
+    url = (elem.get('url') or '').strip()
+    kind = elem.get('type') or elem.get('medium') or ''
+    if url and (kind.startswith('audio') or url.split('?')[0].endswith('.mp3')):
+        return url
+    return None
+
+def _item(elem):
+    item = dict((f, None) for f in ITEM_FIELDS)
+    item['mp3'] = item['duration'] = None
+    for child in elem:
+        if child.tag in ITEM_FIELDS:
+            item[child.tag] = (child.text or '').strip()
+        elif child.tag in ('enclosure', MEDIA_NS + 'content') and item['mp3'] is None:
+            item['mp3'] = _audio_url(child)
+            if item['mp3'] and item['duration'] is None:
+                item['duration'] = parse_duration(child.get('duration'))
+        elif child.tag == ITUNES_NS + 'duration':
+            item['duration'] = parse_duration(child.text)
+    return item
+
+def iter_items(chunks, channel=None):
+    """Yields a dict per <item> in an RSS feed, parsing chunks incrementally.
+
+    Each item has the keys in ITEM_FIELDS plus mp3, the URL of an audio
+    enclosure if the feed lists one, and duration, in seconds if the feed
+    says. Channel fields seen along the way are stored in the channel dict.
+    Parsed items are removed from the tree, so memory use stays flat for
+    large archive feeds.
+    """
+    for batch in iter_batches(chunks, channel):
+        for item in batch:
+            yield item
+
+def iter_batches(chunks, channel=None):
+    """Like iter_items(), but yields a list of the items completed by each chunk."""
+    if channel is None:
+        channel = {}
+    parser = XMLPullParser(events=('start', 'end'))
+    path = []
+
+    def events():
+        for event, elem in parser.read_events():
+            if event == 'start':
+                path.append(elem)
+                continue
+            path.pop()
+            parent = path[-1] if path else None
+            if parent is None or parent.tag != 'channel':
+                continue
+            if elem.tag == 'item':
+                yield _item(elem)
+                parent.remove(elem)
+            elif elem.tag in CHANNEL_FIELDS:
+                channel[elem.tag] = (elem.text or '').strip()
+
+    for chunk in chunks:
+        with trace.span('feed.parse', bytes=len(chunk)):
+            parser.feed(chunk)
+            batch = list(events())
+        if batch:
+            yield batch
+    parser.close()
+    batch = list(events())
+    if batch:
+        yield batch
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+import threading
+
+from .cache import cache_dir
+
+
+FIELDS = ('title', 'program', 'date', 'mp3')
+
+# columns of the stories table searched by EpisodeIndex.search()
+STORY_FIELDS = FIELDS + ('published', 'text')
+
+
+class EpisodeIndex(object):
+    """SQLite index of fields extracted from article pages, keyed by URL.
+
+    Lets a Show build its playlist without fetching or parsing any HTML for
+    episodes it has already seen. Entries are trusted for max_age seconds.
+    Entries without audio are trusted only for retry_after seconds, since
+    NPR usually posts the audio for a story some time after the page.
+
+    Alongside it is a full-text index of every story seen in a feed or
+    page, for search(). It uses SQLite's FTS5 where available and falls
+    back to substring matching where not.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.path = kwargs.get('path', None) or cache_dir('index.sqlite')
+        self.max_age = kwargs.get('max_age', 30 * 24 * 60 * 60)
+        self.retry_after = kwargs.get('retry_after', 15 * 60)
+        import sqlite3
+        self._lock = threading.Lock()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS episodes (
+                    url TEXT PRIMARY KEY,
+                    title TEXT,
+                    program TEXT,
+                    date TEXT,
+                    mp3 TEXT,
+                    checked_at REAL NOT NULL
+                )""")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS stories (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT UNIQUE NOT NULL,
+                    title TEXT,
+                    program TEXT,
+                    date TEXT,
+                    mp3 TEXT,
+                    published TEXT,
+                    text TEXT
+                )""")
+        self.fts = self._create_fts()
+
+    def _create_fts(self):
+        import sqlite3
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS stories_fts USING fts5("
+                    "title, program, text, content='stories', content_rowid='id')")
+                self._db.executescript("""
+                    CREATE TRIGGER IF NOT EXISTS stories_ai AFTER INSERT ON stories BEGIN
+                        INSERT INTO stories_fts (rowid, title, program, text)
+                        VALUES (new.id, new.title, new.program, new.text);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS stories_ad AFTER DELETE ON stories BEGIN
+                        INSERT INTO stories_fts (stories_fts, rowid, title, program, text)
+                        VALUES ('delete', old.id, old.title, old.program, old.text);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS stories_au AFTER UPDATE ON stories BEGIN
+                        INSERT INTO stories_fts (stories_fts, rowid, title, program, text)
+                        VALUES ('delete', old.id, old.title, old.program, old.text);
+                        INSERT INTO stories_fts (rowid, title, program, text)
+                        VALUES (new.id, new.title, new.program, new.text);
+                    END;
+                """)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def is_stale(self, entry, now=None):
+        age = (now or time.time()) - entry['checked_at']
+        if entry['mp3'] is None:
+            return age >= self.retry_after
+        return age >= self.max_age
+
+    def get(self, url):
+        """Returns dict of indexed fields for URL, or None if missing or stale."""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM episodes WHERE url = ?', (url,)).fetchone()
+        if row is None or self.is_stale(row):
+            return None
+        return dict((f, row[f]) for f in FIELDS)
+
+    def put(self, url, fields):
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO episodes (url, title, program, date, mp3, checked_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (url,) + tuple(fields.get(f) for f in FIELDS) + (time.time(),))
+            self._add_stories([dict(fields, url=url)])
+
+    def add_stories(self, stories):
+        """Adds or updates search entries from dicts with url and any of STORY_FIELDS.
+
+        Fields that are None keep their indexed value, so a feed item and its
+        article page can each fill in what they know.
+        """
+        with self._lock, self._db:
+            self._add_stories(stories)
+
+    def _add_stories(self, stories):
+        updates = ', '.join('{0} = coalesce(excluded.{0}, {0})'.format(f) for f in STORY_FIELDS)
+        self._db.executemany(
+            'INSERT INTO stories (url, {}) VALUES (?, {}) ON CONFLICT (url) DO UPDATE SET {}'.format(
+                ', '.join(STORY_FIELDS), ', '.join('?' * len(STORY_FIELDS)), updates),
+            [(s['url'],) + tuple(_plain(s.get(f)) if f == 'text' else s.get(f) for f in STORY_FIELDS)
+             for s in stories])
+
+    def search(self, terms, limit=20):
+        """Returns stories matching every word in terms, best match first.
+
+        Words match as prefixes, across titles, program names and story text.
+        Each result is a dict with url and STORY_FIELDS, less text.
+        """
+        words = re.findall(r'\w+', terms, re.UNICODE)
+        if not words:
+            return []
+        columns = ', '.join('s.' + f for f in ('url',) + STORY_FIELDS[:-1])
+        if self.fts:
+            query = ' '.join('"{}"*'.format(w) for w in words)
+            sql = ('SELECT {} FROM stories_fts JOIN stories s ON s.id = stories_fts.rowid '
+                   'WHERE stories_fts MATCH ? ORDER BY rank, s.published DESC LIMIT ?').format(columns)
+            params = (query, limit)
+        else:
+            text = "coalesce(s.title, '') || ' ' || coalesce(s.program, '') || ' ' || coalesce(s.text, '')"
+            sql = 'SELECT {} FROM stories s WHERE {} ORDER BY s.published DESC LIMIT ?'.format(
+                columns, ' AND '.join([text + ' LIKE ?'] * len(words)))
+            params = tuple('%{}%'.format(w) for w in words) + (limit,)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def entries(self):
+        """Returns every entry as a dict, most recently checked first."""
+        with self._lock:
+            rows = self._db.execute('SELECT * FROM episodes ORDER BY checked_at DESC').fetchall()
+        return [dict(row) for row in rows]
+
+    def remove(self, url):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM episodes WHERE url = ?', (url,))
+
+    def prune(self, older_than=None):
+        """Removes stale entries, or every entry older than older_than seconds.
+
+        Returns the number of entries removed.
+        """
+        now = time.time()
+        if older_than is None:
+            urls = [e['url'] for e in self.entries() if self.is_stale(e, now)]
+        else:
+            urls = [e['url'] for e in self.entries() if now - e['checked_at'] >= older_than]
+        with self._lock, self._db:
+            self._db.executemany('DELETE FROM episodes WHERE url = ?', [(u,) for u in urls])
+        return len(urls)
+
+    def clear(self):
+        """Removes every entry, and every story from the search index."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM stories')
+            return self._db.execute('DELETE FROM episodes').rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM episodes').fetchone()[0]
+
+
+def _plain(text):
+    """Strips the markup feeds often carry in descriptions."""
+    if not text:
+        return text
+    return re.sub(r'\s+', ' ', re.sub(r'<[^>]*>', ' ', text)).strip()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Returns the process-wide EpisodeIndex, creating it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EpisodeIndex()
+        return _index
@@ -1,99 +1,498 @@
 # -*- coding: utf-8 -*-
-import sys, os, subprocess, signal
-
-import requests
-import arrow
-from bs4 import BeautifulSoup
-import xmltodict
-
-from . import utils
+import sys, os
+import datetime
+import hashlib
+import itertools
+import threading
+
+from . import feed, trace, utils
+from .backends import MPlayerBackend, FINISHED, EXITED
+from .cache import FEED_TTL, ARTICLE_TTL
+from .catalog import PROGRAMS, program_for
+from .extract import extract_fields
+from .index import FIELDS
+from .playlist import Playlist
+from .prefetch import Prefetcher
+from .refresh import Refresher
+from .sync import read_manifest
 from .utils import lazyproperty
 from .exceptions import AudioNotAvailable
 
 
+# Page loads for an Episode are serialized by one of these, picked by URL, so
+# threads resolving the same episode fetch it once without a lock per record.
+_LOAD_LOCKS = [threading.Lock() for _ in range(64)]
+
+
 class Show(object):
     """Represents a collection of content from NPR, e.g. Morning Edition."""
 
     def __init__(self, *args, **kwargs):
-        self.feeds = {
-            'morning_edition': 'http://www.npr.org/rss/rss.php?id=3',
-            'weekend_edition_sunday': 'http://www.npr.org/rss/rss.php?id=10',
-            'weekend_edition_saturday': 'http://www.npr.org/rss/rss.php?id=7',
-        }
+        self.feeds = dict((name, p.feed) for name, p in PROGRAMS.items())
         self.program = kwargs.get('program', None)
-        self.feed = kwargs.get('feed', self.find_todays_show())
-
-    @lazyproperty
-    def _raw_feed(self):
-        r = requests.get(self.feed)
-        if not r.ok:
-            raise Exception("Could not retrieve URL. Check internet connection")
-        return xmltodict.parse(r.content)['rss']['channel']
+        # Directory written by `npr sync`; if set, episodes come from its manifest.
+        self.library = kwargs.get('library', None)
+        self.feed = kwargs.get('feed', None)
+        # Publication date of one edition, e.g. of a daily program whose feed
+        # carries several days; if set, only that day's items are episodes.
+        self.edition = kwargs.get('edition', None)
+        if not self.feed:
+            self.feed = self.feeds.get(self.program) or self.find_todays_show()
+        # Default to the process-wide ones, created on first use, so a
+        # synced library plays without loading the network stack or index.
+        self._client = kwargs.get('client', None)
+        self._index = kwargs.get('index', None)
+        self.workers = kwargs.get('workers', 8)
+        self.prefetch_pages = kwargs.get('prefetch', False)
+        self.failures = {}
+        self.channel = {}
+        self._parsed = []
+        self._stream = None
+        # URLs of every item parsed so far, and a digest of the last feed body.
+        self._seen = set()
+        self._digest = None
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _default_client()
+        return self._client
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = _default_index()
+        return self._index
+
+    @classmethod
+    def of(cls, episodes, title, **kwargs):
+        """Returns a Show of the given episodes, e.g. search results, in order."""
+        show = cls(**kwargs)
+        show.feed = None
+        show._parsed = list(episodes)
+        show._stream = iter(())
+        show.channel.update(title=title, lastBuildDate='{} episodes'.format(len(show._parsed)))
+        return show
+
+    def _channel_field(self, name):
+        # Channel fields precede the items, so this rarely parses past the first.
+        for _ in self.iter_episodes():
+            if name in self.channel:
+                break
+        return self.channel.get(name)
 
     @lazyproperty
     def date(self):
-        return self._raw_feed['lastBuildDate'].strip()
+        if self.edition is not None:
+            return self.edition.isoformat()
+        return self._channel_field('lastBuildDate')
 
     @lazyproperty
     def title(self):
-        return self._raw_feed['title'].strip()
+        return self._channel_field('title')
 
     @lazyproperty
     def articles(self):
-        return [a['link'] for a in self._raw_feed['item']]
+        return [e.url for e in self.episodes]
 
     @lazyproperty
     def episodes(self):
-        articles = self.articles
-        episodes = [Episode(a, program=self.title) for a in articles]
+        episodes = list(self.iter_episodes())
+        if self.prefetch_pages:
+            self.prefetch(episodes)
+        return episodes
+
+    def iter_episodes(self):
+        """Yields an Episode for each feed item as soon as it is parsed.
+
+        The feed is parsed once, only as far as callers have iterated; later
+        iterations replay the episodes already parsed before continuing.
+        Only items of self.edition are yielded, if it is set.
+        """
+        for episode in self._iter_parsed():
+            if self._in_edition(episode):
+                yield episode
+
+    def _in_edition(self, episode):
+        return self.edition is None or edition_of(episode) == self.edition
+
+    def _after_edition(self, episode):
+        edition = edition_of(episode)
+        return self.edition is not None and edition is not None and edition > self.edition
+
+    def _iter_parsed(self):
+        i = 0
+        while True:
+            with self._lock:
+                if i >= len(self._parsed):
+                    if self._stream is None:
+                        self._stream = self._parse_episodes()
+                    try:
+                        self._parsed.append(next(self._stream))
+                    except StopIteration:
+                        return
+                    except Exception:
+                        self._stream = None
+                        raise
+                episode = self._parsed[i]
+            yield episode
+            i += 1
+
+    def iter_playable(self, workers=None, start=None):
+        """Yields only episodes with audio, in feed order, resolving ahead in the background.
+
+        Article pages for the next few episodes are fetched by a pool of
+        threads while the caller handles the current one, so the first
+        episode is ready after one feed fetch and one page fetch. Episodes
+        that fail, e.g. with AudioNotAvailable, are recorded in self.failures
+        and skipped.
+
+        If start is the URL of an episode of the show, iteration begins there
+        and the episodes before it are never resolved.
+        """
+        episodes = self.iter_episodes()
+        if start is not None:
+            for i, episode in enumerate(self.iter_episodes()):
+                if episode.url == start:
+                    episodes = itertools.islice(self.iter_episodes(), i, None)
+                    break
+        results = utils.resolve_ahead(Episode.resolve, episodes, workers or self.workers)
+        for episode, error in results:
+            if error is None:
+                self.failures.pop(episode.url, None)
+                yield episode
+            else:
+                self.failures[episode.url] = error
+
+    def _parse_episodes(self):
+        """Yields Episodes straight from the feed, or from the synced library.
+
+        Fields the feed already carries, including an audio enclosure, are
+        handed to the Episode so it only fetches its article page for the rest.
+        The items parsed from each chunk of the feed are added to the index's
+        search entries together, as soon as the chunk is parsed.
+        """
+        if self.library:
+            for episode in self._library_episodes():
+                yield episode
+            return
+        digest = hashlib.sha1()
+        def chunks():
+            for chunk in self.client.iter_fetch(self.feed, ttl=FEED_TTL):
+                digest.update(chunk)
+                yield chunk
+        for episode in self._feed_episodes(feed.iter_batches(chunks(), self.channel)):
+            yield episode
+        self._digest = digest.hexdigest()
+
+    def _feed_episodes(self, batches):
+        """Yields an Episode per feed item not seen before, from lists of items.
+
+        Each list is indexed for search in one transaction before any of its
+        episodes are yielded, so stories are searchable even if the show is
+        only read part of the way.
+        """
+        for items in batches:
+            items = [i for i in items if i['link'] and i['link'] not in self._seen]
+            self._seen.update(i['link'] for i in items)
+            published = [feed.parse_date(i['pubDate']) for i in items]
+            self.index.add_stories([{
+                'url': item['link'],
+                'title': item['title'],
+                'program': self.channel.get('title'),
+                'mp3': item['mp3'],
+                'published': date.isoformat() if date else None,
+                'text': item['description'],
+            } for item, date in zip(items, published)])
+            for item, date in zip(items, published):
+                yield Episode(item['link'],
+                              title=item['title'],
+                              mp3=item['mp3'],
+                              date=item['pubDate'] if item['mp3'] else None,
+                              duration=item['duration'],
+                              published=date,
+                              program=self.channel.get('title'),
+                              client=self.client,
+                              index=self.index)
+
+    def refresh(self):
+        """Fetches the feed again and returns Episodes for items not seen before.
+
+        The new episodes are added to the end of the show. The fetch goes
+        through the client's cache, so within FEED_TTL of the last one nothing
+        is sent, and after that a conditional GET usually answers 304 Not
+        Modified; an unchanged body isn't parsed at all.
+
+        Episodes in self.failures for lack of audio, e.g. stories posted
+        before their audio, are checked again with Episode.recheck() and
+        returned too, after the new ones.
+
+        If self.edition is set and a later edition now has audio, e.g. the
+        day's first stories once they are posted, the show moves on to it.
+        """
+        if self.library or not self.feed:
+            return []
+        for _ in self.iter_episodes():
+            pass
+        body = self.client.fetch(self.feed, ttl=FEED_TTL)
+        digest = hashlib.sha1(body).hexdigest()
+        audio = {}
+        with self._lock:
+            retry = [e for e in self._parsed if isinstance(self.failures.get(e.url), AudioNotAvailable)
+                     or self._after_edition(e)]
+            if digest == self._digest:
+                trace.count('feed.unchanged')
+                new = []
+            else:
+                self._digest = digest
+                items = list(feed.iter_items([body], self.channel))
+                audio = dict((i['link'], i['mp3']) for i in items if i['mp3'])
+                new = list(self._feed_episodes([items]))
+                self._parsed.extend(new)
+        results = utils.map_concurrently(lambda e: e.recheck(audio.get(e.url)), retry, self.workers)
+        for episode, (_, error) in zip(retry, results):
+            if error is not None:
+                self.failures[episode.url] = error
+        posted = [edition_of(e) for e in new + retry
+                  if self._after_edition(e) and e.known_fields()['mp3']]
+        if posted:
+            self.edition = max(posted)
+        if new or posted:
+            utils.invalidate(self)
+        return [e for e in new + retry if self._in_edition(e)]
+
+    def _library_episodes(self):
+        manifest = read_manifest(self.library)
+        if manifest is None:
+            raise IOError("No synced show in {}; run `npr sync` first.".format(self.library))
+        self.channel.update(title=manifest['title'], lastBuildDate=manifest['date'])
+        for e in manifest['episodes']:
+            yield Episode(e['url'],
+                          title=e['title'],
+                          program=e['program'],
+                          date=e['date'],
+                          mp3=os.path.abspath(os.path.join(self.library, e['file'])),
+                          duration=e.get('duration'),
+                          client=self._client,
+                          index=self._index)
+
+    def prefetch(self, episodes=None, workers=None):
+        """Fetches and parses episode pages concurrently, keeping feed order.
+
+        Failures are recorded per episode in self.failures, keyed by URL,
+        rather than raised.
+        """
+        if episodes is None:
+            episodes = self.episodes
+        workers = workers or self.workers
+        results = utils.map_concurrently(Episode.resolve, episodes, workers)
+        for episode, (_, error) in zip(episodes, results):
+            if error is None:
+                self.failures.pop(episode.url, None)
+            else:
+                self.failures[episode.url] = error
         return episodes
 
     def find_todays_show(self):
         """Finds most recent Show available now."""
-        today = arrow.now().format('dddd')
-
-        if today == 'Saturday':
-            feed = self.feeds['weekend_edition_saturday']
-        elif today == 'Sunday':
-            feed = self.feeds['weekend_edition_sunday']
-        else:
-            feed = self.feeds['morning_edition']
-        return feed
+        return self.feeds[program_for(datetime.date.today())]
+
+    def editions(self):
+        """Returns the dates of the editions in the feed, newest first.
+
+        Items without a publication date make up one edition, None, last.
+        """
+        dates = set(edition_of(e) for e in self._iter_parsed())
+        return sorted((d for d in dates if d is not None), reverse=True) + (
+            [None] if None in dates else [])
+
+    def playable_edition(self, probe=3, since=None):
+        """Returns the date of the newest edition that already has audio.
+
+        Every episode of an edition is checked, `probe` at a time, stopping at
+        the first with audio, so stories still waiting for theirs don't hide
+        the rest. Audio enclosures in the feed or entries in the index answer
+        without fetching article pages. Editions before the date since are
+        skipped. Raises AudioNotAvailable if no edition has audio, or the
+        fetch error if a check failed for lack of a page rather than audio.
+        """
+        parsed = list(self._iter_parsed())
+        errors = []
+        for edition in self.editions():
+            if since is not None and edition is not None and edition < since:
+                break
+            episodes = [e for e in parsed if edition_of(e) == edition]
+            for episode, error in utils.resolve_ahead(Episode.resolve, episodes, probe):
+                if error is None:
+                    return edition
+                if not isinstance(error, AudioNotAvailable):
+                    errors.append(error)
+        if errors:
+            raise errors[0]
+        raise AudioNotAvailable
+
+    def has_audio(self, probe=3):
+        """Returns True if any edition of the show has audio yet; see playable_edition()."""
+        try:
+            self.playable_edition(probe)
+        except AudioNotAvailable:
+            return False
+        return True
+
+    @property
+    def key(self):
+        """Identifies the show across runs: its library directory, or feed URL and edition."""
+        if self.library:
+            return os.path.abspath(self.library)
+        if self.edition is not None:
+            return '{}#{}'.format(self.feed, self.edition.isoformat())
+        return self.feed
 
     def __str__(self):
         return "{} ({})".format(self.title, self.date)
 
+def _default_client():
+    from .client import get_client
+    return get_client()
+
+def _default_index():
+    from .index import get_index
+    return get_index()
+
+def edition_of(episode):
+    """Returns the date episode was published, in the feed's own time zone, or None."""
+    return episode.published.date() if episode.published else None
+
 class Episode(object):
-    """Represents a single audio story from an NPR show."""
+    """Represents a single audio story from an NPR show.
 
-    def __init__(self, url, *args, **kwargs):
-        self.url = url
+    A compact record: fields the feed, the index or a synced library already
+    know are passed in, and the rest are filled in from the article page on
+    first access. Only the extracted strings are kept, never the page.
+    """
 
-    @lazyproperty
-    def _soup(self):
-        r = requests.get(self.url)
-        if not r.ok:
-            raise Exception("Could not retrieve URL. Check internet connection")
-        return BeautifulSoup(r.content)
+    __slots__ = ('url', 'duration', 'published', '_client', '_index', '_loaded',
+                 '_title', '_program', '_date', '_mp3')
 
-    @lazyproperty
+    def __init__(self, url, *args, **kwargs):
+        self.url = url
+        for f in FIELDS:
+            setattr(self, '_' + f, kwargs.get(f) or None)
+        # Length of the audio in seconds, if the feed or library says.
+        self.duration = kwargs.get('duration', None)
+        # When the feed says it was published, as a datetime; used for sorting.
+        self.published = kwargs.get('published', None)
+        self._client = kwargs.get('client', None)
+        self._index = kwargs.get('index', None)
+        self._loaded = False
+
+    @classmethod
+    def from_fields(cls, url, fields, **kwargs):
+        """Returns an Episode built from extracted or indexed fields, without fetching."""
+        kwargs.update((f, fields.get(f)) for f in FIELDS)
+        episode = cls(url, **kwargs)
+        episode._loaded = True
+        return episode
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _default_client()
+        return self._client
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = _default_index()
+        return self._index
+
+    def _load(self):
+        """Fills in unknown fields from the index if possible, else the page."""
+        with _LOAD_LOCKS[hash(self.url) % len(_LOAD_LOCKS)]:
+            if self._loaded:
+                return
+            with trace.span('episode.metadata', url=self.url):
+                fields = self.index.get(self.url)
+                if fields is not None:
+                    trace.count('index.hit')
+                else:
+                    trace.count('index.miss')
+                    fields = extract_fields(self.client.fetch(self.url, ttl=ARTICLE_TTL))
+                    self.index.put(self.url, fields)
+            for f in FIELDS:
+                if getattr(self, '_' + f) is None:
+                    setattr(self, '_' + f, fields[f] or None)
+            self._loaded = True
+
+    def recheck(self, mp3=None):
+        """Looks for audio again after resolve() found none.
+
+        Takes mp3 if the feed has it now; otherwise fetches the article page
+        again, unless it was fetched within FEED_TTL, and re-indexes it.
+        """
+        with _LOAD_LOCKS[hash(self.url) % len(_LOAD_LOCKS)]:
+            if mp3:
+                self._mp3 = mp3
+                return self
+            fields = extract_fields(self.client.fetch(self.url, ttl=FEED_TTL))
+            self.index.put(self.url, fields)
+            for f in FIELDS:
+                if getattr(self, '_' + f) is None:
+                    setattr(self, '_' + f, fields[f] or None)
+            self._loaded = True
+        return self
+
+    def known_fields(self):
+        """Returns a dict of fields known so far, without fetching anything."""
+        return dict((f, getattr(self, '_' + f)) for f in FIELDS)
+
+    def _field(self, name):
+        value = getattr(self, '_' + name)
+        if value is None and not self._loaded:
+            self._load()
+            value = getattr(self, '_' + name)
+        return value
+
+    @property
     def title(self):
-        return self._soup.find('div', attrs={'class': 'storytitle'}).getText().strip()
+        return self._field('title')
 
-    @lazyproperty
+    @property
     def mp3(self):
-        try:
-            url = self._soup.find('a', attrs={'class': 'download'}, href=True)['href'].strip()
-        except TypeError:
+        url = self._field('mp3')
+        if not url:
             raise AudioNotAvailable
         return url
-    @lazyproperty
+
+    @property
     def program(self):
-        return self._soup.find('a', attrs={'class': 'program'}).getText().strip()
+        return self._field('program')
 
-    @lazyproperty
+    @property
     def date(self):
-        return self._soup.find('span', attrs={'class': 'date'}).getText().strip()
+        return self._field('date')
+
+    def resolve(self):
+        """Fetches the article page, if needed, for the fields playback uses.
+
+        Raises AudioNotAvailable if the episode has no audio yet.
+        """
+        self.mp3
+        self.title
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, Episode) and self.url == other.url
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.url)
+
+    def __repr__(self):
+        return "Episode({!r})".format(self.url)
 
     def __str__(self):
         return "{0} ({1}) - {2}".format(self.program, self.date, self.title)
@@ -102,73 +501,235 @@ class Player(object):
     """Handler for navigating audio files for a given show."""
 
     def __init__(self, *args, **kwargs):
-        self.show = kwargs.get('show', Show())
+        self.show = kwargs.get('show', None) or Show()
         self.verbose = kwargs.get('verbose', True)
+        self.stdin = kwargs.get('stdin', None)
 
         if self.verbose:
             print("Now playing: {}".format(self.show))
 
         self.now_playing = None
-        self.pid = None
+        self.preloaded = None
+
+        # Long-lived audio backend; anything with the backends.Backend interface.
+        self.backend = kwargs.get('backend', None) or MPlayerBackend()
+        # Queue the next track inside the backend so it starts without a gap.
+        self.gapless = kwargs.get('gapless', True)
+
+        # Number of upcoming episodes to download while one plays; 0 disables.
+        # With a transcode.Transcoder they are converted, and the compact
+        # copies played, once ready.
+        self.prefetch = kwargs.get('prefetch', 2)
+        self.transcoder = kwargs.get('transcoder', None)
+        self.prefetcher = None
+        if self.prefetch:
+            client = None if self.show.library else self.show.client
+            self.prefetcher = Prefetcher(ahead=self.prefetch, client=client,
+                                         transcoder=self.transcoder)
+
+        # Seconds between feed refreshes while playing; new episodes are
+        # appended to the playlist. None disables. Shows in refresh_shows,
+        # e.g. other subscriptions, are kept fresh too but not queued.
+        self.refresh = kwargs.get('refresh', None)
+        self.refresher = None
+        if self.refresh:
+            shows = [self.show] + list(kwargs.get('refresh_shows', ()))
+            self.refresher = Refresher(shows, interval=self.refresh)
+
+        # resume.Resume keeping the episode playing and the offset into it;
+        # play() then starts where the last run of the same show stopped.
+        # None disables.
+        self.resume = kwargs.get('resume', None)
+        self._resume_from = None
 
         self.keybindings = {
             'n': self.next_track,
             'p': self.previous_track,
+            's': self.shuffle,
             'q': self.quit,
         }
+        for n in range(1, 10):
+            self.keybindings[str(n)] = lambda n=n: self.jump(n - 1)
 
         #signal.signal(signal.SIGINT, clean_up_terminal)
 
-    def play(self, episode=None):
-        """Start mplaying music with mplayer."""
-        if not episode:
+    def play(self, episode=None, watches=None):
+        """Starts playing episode, or the next track, then handles keys until quit.
+
+        watches maps more file descriptors to callbacks for the event loop,
+        as in utils.listen(), e.g. a control socket.
+        """
+        with trace.span('player.start'):
+            if episode is not None:
+                self.load(episode)
+            elif not self.resume_playback():
+                self.next_track()
+        watches = dict(watches or {})
+        watches[self.backend.fileno()] = self.handle_events
+        if self.refresher:
+            watches[self.refresher.fileno()] = self.handle_refresh
+            self.refresher.start()
+        if self.resume:
+            self.resume.start(self.track_position)
+        utils.listen(self.keybindings, watches, self.stdin)
+
+    def source(self, episode):
+        """Returns the local copy of episode's audio if there is one, else its URL."""
+        if self.prefetcher:
+            return self.prefetcher.local_path(episode) or episode.mp3
+        return episode.mp3
+
+    def resume_playback(self):
+        """Starts the episode the last run of this show stopped in, where it stopped.
+
+        The episode is built from the saved fields, so it starts without
+        waiting for the feed or any page, and the playlist then continues
+        from it. Returns False if there is nothing to resume.
+        """
+        state = self.resume.get(self.show.key) if self.resume else None
+        if state is None:
+            return False
+        fields = dict((f, v) for f, v in (state.get('fields') or {}).items()
+                      if f in FIELDS + ('duration',))
+        episode = Episode(state['url'], client=self.show._client, index=self.show._index, **fields)
+        try:
+            episode.resolve()
+        except Exception:
+            return False
+        self._resume_from = episode.url
+        self.load(episode, start=state.get('position') or 0)
+        return True
+
+    def load(self, episode, start=0):
+        """Switches the backend to episode, start seconds in, and queues the one after it.
+
+        episode is None when the playlist has nothing playable; playback
+        stops until handle_refresh() finds something.
+        """
+        if episode is None:
+            self.now_playing = self.preloaded = None
+            self.backend.stop()
+            if self.verbose:
+                print("\nNothing playable yet.", end='')
+            return
+        with trace.span('player.load', url=episode.url):
+            if self.playlist.current != episode:
+                self.playlist.seek(episode)
+            self.now_playing = episode
+            self.backend.load(self.source(episode))
+            if start:
+                self.backend.seek(start)
+            self.remember(episode, start)
+            self.preloaded = None
+            self.preload_next()
+            if self.prefetcher:
+                self.prefetcher.update(self.playlist, episode)
+        self.pretty_info()
+
+    def preload_next(self):
+        if not self.gapless:
+            return
+        upcoming = self.playlist.peek()
+        if upcoming is None or upcoming == self.now_playing:
+            return
+        try:
+            self.backend.preload(self.source(upcoming))
+        except AudioNotAvailable:
+            return
+        self.preloaded = upcoming
+
+    def handle_events(self):
+        """Reacts to backend events; returns True to stop the event loop."""
+        for event in self.backend.read_events():
+            if event == FINISHED:
+                self.track_finished()
+            elif event == EXITED:
+                return True
+        return False
+
+    def handle_refresh(self):
+        """Appends episodes new to the show's feed to the end of the playlist."""
+        for show, episodes in self.refresher.read_updates():
+            if show is self.show:
+                self.playlist.enqueue(episodes)
+        if self.now_playing is None:
             self.next_track()
-        self.now_playing = episode
+        elif self.preloaded is None:
+            self.preload_next()
+        return False
+
+    def track_finished(self):
+        """Moves on once the backend reaches the end of the current track."""
+        upcoming = self.playlist.next()
+        if self.preloaded is None or upcoming != self.preloaded:
+            self.load(upcoming)
+            return
+        self.now_playing, self.preloaded = upcoming, None
+        self.remember(upcoming, 0)
+        self.preload_next()
+        if self.prefetcher:
+            self.prefetcher.update(self.playlist, self.now_playing)
+        self.pretty_info()
 
-        cmd = ['/usr/bin/mplayer', '-noconsolecontrols', '-cache-min', '20', episode.mp3]
+    def remember(self, episode, position):
+        """Records episode and position for resuming; written out in batches."""
+        if self.resume and episode is not None:
+            fields = dict(episode.known_fields(), duration=episode.duration)
+            self.resume.update(self.show.key, episode.url, position, fields)
 
-        self.kill()
-        self._proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        self.pid = self._proc.pid
+    def track_position(self):
+        """Records how far into now_playing the backend is; run by the resume thread."""
+        episode = self.now_playing
+        if episode is not None:
+            self.remember(episode, self.backend.position)
+            self.backend.query_position()
 
-        self.pretty_info()
-        utils.listen_for_keypress(self.keybindings, self._proc)
-        
     @lazyproperty
     def playlist(self):
-        return self.show.episodes
+        return Playlist(source=self.show.iter_playable(start=self._resume_from))
 
     def pretty_info(self):
         """Prints title of currently playing story."""
-        if self.now_playing:
+        if self.now_playing and self.verbose:
             msg = "\n - {e.title}".format(e=self.now_playing)
             print(msg, end='')
 
     def kill(self, exit=None):
-        """Kills currently running process of mplayer, if any."""
-        if self.pid:
-            try:
-                os.kill(self.pid, signal.SIGTERM)
-            except ProcessLookupError:
-                pass
-
-            self.pid = None
+        """Stops playback in the backend, if any."""
+        self.backend.stop()
 
     def quit(self):
-        """Kills currently running process of mplayer, if any, then exits."""
-        self.kill()
-        print("\n\nExit")
+        """Shuts down the backend and background downloads, then exits."""
+        if self.resume:
+            self.remember(self.now_playing, self.backend.position)
+            self.resume.stop()
+        self.backend.close()
+        if self.prefetcher:
+            self.prefetcher.stop()
+        if self.refresher:
+            self.refresher.stop()
+        if self.transcoder:
+            self.transcoder.close(wait=False)
+        if self.verbose:
+            print("\n\nExit")
         sys.exit(0)
 
     def next_track(self):
         """Plays next track in playlist."""
-        next_item = utils.get_next_item(self.playlist, self.now_playing)
-        self.now_playing = next_item
-        self.play(next_item)
+        self.load(self.playlist.next())
 
     def previous_track(self):
         """Plays previous track in playlist."""
-        previous_item = utils.get_previous_item(self.playlist, self.now_playing)
-        self.now_playing = previous_item
-        self.play(previous_item)
+        self.load(self.playlist.previous())
 
+    def jump(self, n):
+        """Plays track number n of the playlist, counting from 0."""
+        try:
+            episode = self.playlist.jump(n)
+        except IndexError:
+            return
+        self.load(episode)
+
+    def shuffle(self):
+        """Shuffles the tracks after the current one."""
+        self.playlist.shuffle()
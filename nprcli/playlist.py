@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import random
+import itertools
+import threading
+
+
+class Playlist(object):
+    """Indexable queue of episodes with a cursor marking the one playing.
+
+    next(), previous(), peek() and jump() are O(1), and so is index(), which
+    looks items up by hash rather than scanning. Items may come from an
+    iterator such as Show.iter_episodes(); it is only consumed as far as
+    navigation needs, so the playlist grows lazily. Items may be looked up
+    from another thread, e.g. by a prefetch.Prefetcher, which then does the
+    pulling.
+    """
+
+    def __init__(self, items=(), source=None, wrap=True):
+        self._items = []
+        self._positions = {}
+        self._source = iter(source) if source is not None else None
+        self.wrap = wrap
+        self.cursor = -1
+        self._lock = threading.RLock()
+        self.extend(items)
+
+    def _fill(self, n=None):
+        """Pulls from the source until there are more than n items, or all of them."""
+        if n is not None and n < len(self._items):
+            return True
+        with self._lock:
+            while self._source is not None and (n is None or len(self._items) <= n):
+                try:
+                    item = next(self._source)
+                except StopIteration:
+                    self._source = None
+                    break
+                self.append(item)
+        return n is None or n < len(self._items)
+
+    @property
+    def exhausted(self):
+        """True once every item of the source has been pulled in."""
+        return self._source is None
+
+    @property
+    def current(self):
+        if 0 <= self.cursor < len(self._items):
+            return self._items[self.cursor]
+        return None
+
+    def append(self, item):
+        """Queues item after those pulled in so far, unless it's already queued."""
+        with self._lock:
+            if item in self._positions:
+                return
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def enqueue(self, items):
+        """Queues items after all the others, including those the source is yet to yield."""
+        with self._lock:
+            if self._source is None:
+                self.extend(items)
+            else:
+                self._source = itertools.chain(self._source, list(items))
+
+    def index(self, item):
+        try:
+            return self._positions[item]
+        except KeyError:
+            raise ValueError("{!r} is not in playlist".format(item))
+
+    def peek(self, offset=1):
+        """Returns the item offset places from the cursor without moving, or None."""
+        i = self.cursor + offset
+        if i < 0 or not self._fill(i):
+            if offset > 0 and self.wrap and self._items:
+                return self._items[(self.cursor + offset) % len(self._items)]
+            return None
+        return self._items[i]
+
+    def next(self):
+        """Moves to and returns the next item, wrapping to the first at the end."""
+        if self._fill(self.cursor + 1):
+            self.cursor += 1
+        elif self.wrap and self._items:
+            self.cursor = 0
+        return self.current
+
+    def previous(self):
+        """Moves to and returns the previous item, staying put on the first."""
+        if self.cursor > 0:
+            self.cursor -= 1
+        return self.current
+
+    def jump(self, n):
+        """Moves to and returns item number n, counting from 0."""
+        if n < 0 or not self._fill(n):
+            raise IndexError("playlist has no item {}".format(n))
+        self.cursor = n
+        return self.current
+
+    def seek(self, item):
+        """Moves the cursor to item, appending it first if it isn't queued."""
+        self.append(item)
+        self.cursor = self._positions[item]
+        return item
+
+    def shuffle(self):
+        """Shuffles the items pulled in so far after the current one.
+
+        Doesn't pull from the source, which may mean resolving episodes, so
+        items still to come are queued after the shuffled ones, in order.
+        """
+        with self._lock:
+            rest = self._items[self.cursor + 1:]
+            random.shuffle(rest)
+            self._items[self.cursor + 1:] = rest
+            self._positions = dict((item, i) for i, item in enumerate(self._items))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.stop is None or key.stop < 0 or (key.start or 0) < 0:
+                self._fill()
+            else:
+                self._fill(key.stop - 1)
+            return self._items[key]
+        if key < 0:
+            self._fill()
+        elif not self._fill(key):
+            raise IndexError(key)
+        return self._items[key]
+
+    def __len__(self):
+        """Number of items pulled in so far."""
+        return len(self._items)
+
+    def __iter__(self):
+        i = 0
+        while self._fill(i):
+            yield self._items[i]
+            i += 1
+
+    def __contains__(self, item):
+        return item in self._positions
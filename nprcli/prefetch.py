@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import os
+import hashlib
+import threading
+
+from . import utils
+from .cache import cache_dir
+from .exceptions import AudioNotAvailable
+
+
+class AudioCache(object):
+    """Directory of downloaded episode audio, kept under a disk budget."""
+
+    def __init__(self, *args, **kwargs):
+        self.path = kwargs.get('path', None) or cache_dir('audio')
+        self.max_size = kwargs.get('max_size', 512 * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def path_for(self, url):
+        ext = os.path.splitext(url.split('?')[0])[1] or '.mp3'
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest() + ext)
+
+    def get(self, url):
+        """Returns local path of audio for url if fully downloaded, else None."""
+        path = self.path_for(url)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def evict(self, keep=()):
+        """Removes least recently used files, other than keep, until under max_size."""
+        keep = set(keep)
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.path):
+                path = os.path.join(self.path, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_size:
+                    break
+                if path.split('.part')[0] in keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+
+class Prefetcher(object):
+    """Downloads the episodes around the one playing, in the background.
+
+    update() is called on every track change with the playlist and the current
+    episode. The next `ahead` episodes and the previous `behind` ones are then
+    fetched into the AudioCache, nearest first. A download in flight for an
+    episode that is no longer wanted is cancelled. Given a transcode.Transcoder,
+    each download is also converted, and local_path() prefers the result.
+
+    Episodes are looked up by position on the prefetch thread, so a playlist
+    that grows lazily is pulled from there, never from the caller's thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cache = kwargs.get('cache', None) or AudioCache()
+        self.client = kwargs.get('client', None)
+        self.ahead = kwargs.get('ahead', 2)
+        self.behind = kwargs.get('behind', 1)
+        self.transcoder = kwargs.get('transcoder', None)
+        self._playlist = []
+        self._targets = []
+        self._wanted = ()
+        self._playing = None
+        self._current = None
+        self._cancel = threading.Event()
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='nprcli-prefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def local_path(self, episode):
+        """Returns path of episode's audio if it has been prefetched, else None."""
+        try:
+            url = episode.mp3
+        except AudioNotAvailable:
+            return None
+        if self.transcoder is not None:
+            compact = self.transcoder.output_for(self.cache.path_for(url))
+            if os.path.exists(compact):
+                os.utime(compact, None)
+                return compact
+        return self.cache.get(url)
+
+    def update(self, playlist, current):
+        """Retargets prefetching at the neighbours of current in playlist."""
+        try:
+            i = playlist.index(current)
+        except ValueError:
+            i = -1
+        targets = list(range(i + 1, i + 1 + self.ahead))
+        targets += reversed(range(max(0, i - self.behind), max(0, i)))
+        with self._cond:
+            self._playlist = playlist
+            self._targets = targets
+            self._wanted = frozenset(targets)
+            self._playing = current
+            if self._current is not None and self._position(self._current) not in self._wanted:
+                self._cancel.set()
+            self._cond.notify()
+
+    def _position(self, episode):
+        try:
+            return self._playlist.index(episode)
+        except ValueError:
+            return None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._targets = []
+            self._cancel.set()
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(5)
+
+    def _next_target(self):
+        """Waits for the next wanted episode; returns it and its cancel event, or Nones on stop."""
+        while True:
+            with self._cond:
+                while not self._targets:
+                    self._current = None
+                    if self._stopped:
+                        return None, None
+                    self._cond.wait()
+                playlist, i = self._playlist, self._targets.pop(0)
+            try:
+                # May pull from the playlist's source, i.e. resolve episodes.
+                episode = playlist[i]
+            except IndexError:
+                continue
+            with self._cond:
+                if self._stopped:
+                    return None, None
+                if self._playlist is playlist and i in self._wanted:
+                    self._current = episode
+                    self._cancel = threading.Event()
+                    return episode, self._cancel
+
+    def _keep(self):
+        """Returns the episodes whose audio eviction must spare."""
+        with self._cond:
+            playlist, wanted, playing = self._playlist, self._wanted, self._playing
+        keep = [playing]
+        for i in wanted:
+            if i < len(playlist):
+                keep.append(playlist[i])
+        return keep
+
+    def _run(self):
+        while True:
+            episode, cancel = self._next_target()
+            if episode is None:
+                return
+            try:
+                url = episode.mp3
+                if '://' not in url or self.local_path(episode):
+                    continue
+                path = utils.download_file(url, path=self.cache.path_for(url), client=self.client,
+                                           cancel=cancel, verbose=False)
+                if path and self.transcoder is not None:
+                    self.transcoder.submit(path)
+            except Exception:
+                continue
+            keep = []
+            for e in self._keep():
+                try:
+                    path = self.cache.path_for(e.mp3)
+                except Exception:
+                    continue
+                keep.append(path)
+                if self.transcoder is not None:
+                    keep.append(self.transcoder.output_for(path))
+            self.cache.evict(keep)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from . import utils
+from .cache import FEED_TTL
+
+
+class Refresher(object):
+    """Polls shows' feeds on a background thread and hands over new episodes.
+
+    Every interval seconds each show is refreshed, and the episodes new to
+    it are resolved there too, so the event loop never waits on the network.
+    Episodes that resolve are queued, and fileno() becomes readable, in the
+    same way as a backend's events; read_updates() returns them. Episodes
+    without audio yet are left in the show's failures, and Show.refresh()
+    checks them again on every poll until their audio is posted. Errors
+    are kept per feed in self.failures.
+    """
+
+    def __init__(self, shows, *args, **kwargs):
+        self.shows = list(shows)
+        self.interval = kwargs.get('interval', FEED_TTL)
+        self.workers = kwargs.get('workers', 4)
+        self.failures = {}
+        self._updates = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='nprcli-refresh')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Refreshes every show once; returns the number of new playable episodes."""
+        found = 0
+        for show in self.shows:
+            try:
+                new = show.refresh()
+            except Exception as e:
+                self.failures[show.feed] = e
+                continue
+            self.failures.pop(show.feed, None)
+            results = utils.map_concurrently(lambda e: e.resolve(), new, self.workers)
+            playable = []
+            for episode, (_, error) in zip(new, results):
+                if error is None:
+                    show.failures.pop(episode.url, None)
+                    playable.append(episode)
+                else:
+                    show.failures[episode.url] = error
+            if not playable:
+                continue
+            found += len(playable)
+            with self._lock:
+                self._updates.append((show, playable))
+            try:
+                os.write(self._w, b'.')
+            except OSError:
+                pass
+        return found
+
+    def fileno(self):
+        return self._r
+
+    def read_updates(self):
+        """Returns (show, new episodes) pairs found since the last call, oldest first."""
+        try:
+            os.read(self._r, 1024)
+        except OSError:
+            pass
+        with self._lock:
+            updates, self._updates = self._updates, []
+        return updates
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        for fd in (self._r, self._w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
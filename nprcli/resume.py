@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import threading
+
+from .cache import cache_dir
+
+
+# shows whose positions are kept; the least recently played are dropped
+MAX_SHOWS = 50
+
+
+class Resume(object):
+    """Remembers which episode of each show was playing, and how far in, across runs.
+
+    Positions are kept per show, by Show.key, so playing one show doesn't
+    lose the place in another. update() only records the position in
+    memory. A background thread calls tick, if given, and then writes the
+    state file every interval seconds, and only when it changed, so a long
+    listen costs a write every few seconds at most. flush() writes straight
+    away, e.g. on quit. A write merges into what is on disk, which other
+    players may have saved, then goes to a temporary file that replaces
+    the old one, so a crash leaves either the previous state or the new one.
+
+    The episode's fields are saved with it, so the next run can start it
+    without resolving anything.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.path = kwargs.get('path', None) or cache_dir('resume.json')
+        self.interval = kwargs.get('interval', 10)
+        self.max_shows = kwargs.get('max_shows', MAX_SHOWS)
+        self.writes = 0
+        self._pending = {}
+        self._written = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Returns the saved state of every show, as a dict of show key -> state."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        shows = state.get('shows') if isinstance(state, dict) else None
+        if not isinstance(shows, dict):
+            return {}
+        return dict((k, v) for k, v in shows.items() if isinstance(v, dict) and v.get('url'))
+
+    def get(self, show):
+        """Returns the state saved for show, the key passed to update(), or None."""
+        if show is None:
+            return None
+        with self._lock:
+            state = self._pending.get(show)
+        return state or self.load().get(show)
+
+    def update(self, show, url, position, fields=None):
+        """Records that url from show is playing, position seconds in."""
+        if show is None:
+            return
+        state = {
+            'url': url,
+            'position': round(max(position or 0, 0), 1),
+            'fields': fields or {},
+        }
+        with self._lock:
+            self._pending[show] = state
+
+    def flush(self):
+        """Writes the states that changed since the last write; returns True if written."""
+        with self._lock:
+            changed = dict((k, v) for k, v in self._pending.items() if self._written.get(k) != v)
+            if not changed:
+                return False
+            shows = self.load()
+            now = time.time()
+            for show, state in changed.items():
+                shows[show] = dict(state, saved_at=now)
+            keep = sorted(shows, key=lambda k: (k in changed, shows[k].get('saved_at') or 0),
+                          reverse=True)
+            shows = dict((k, shows[k]) for k in keep[:self.max_shows])
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump({'shows': shows}, f)
+            os.replace(tmp, self.path)
+            self._written.update(changed)
+            self.writes += 1
+        return True
+
+    def clear(self, show=None):
+        """Forgets the state of show, or of every show."""
+        with self._lock:
+            if show is None:
+                self._pending, self._written = {}, {}
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+                return
+            self._pending.pop(show, None)
+            self._written.pop(show, None)
+            shows = self.load()
+            if shows.pop(show, None) is not None:
+                tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+                with open(tmp, 'w') as f:
+                    json.dump({'shows': shows}, f)
+                os.replace(tmp, self.path)
+
+    def start(self, tick=None):
+        self._thread = threading.Thread(target=self._run, args=(tick,), name='nprcli-resume')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, tick):
+        while not self._stopped.wait(self.interval):
+            if tick is not None:
+                tick()
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def stop(self):
+        """Stops the background thread and writes any last change."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        try:
+            self.flush()
+        except OSError:
+            pass
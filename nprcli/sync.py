@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import time
+
+from . import utils
+
+
+MANIFEST = 'manifest.json'
+
+
+def filename_for(episode):
+    """Returns a stable local filename for an episode, from its article URL.
+
+    NPR article URLs end in /<story id>/<slug>, which makes a readable name.
+    """
+    parts = [p for p in episode.url.split('?')[0].split('/') if p][-2:]
+    name = re.sub(r'[^A-Za-z0-9._-]+', '-', '-'.join(parts)).strip('-.')
+    return (name or 'episode')[:120] + '.mp3'
+
+def read_manifest(directory):
+    """Returns the manifest of a synced directory, or None if there isn't one."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+class Sync(object):
+    """Downloads every available episode of one or more Shows for offline use.
+
+    Each show goes to its own directory along with a manifest.json describing
+    the episodes, so Show(library=directory) can play it back without the
+    network. Files already present are skipped. Downloads for all shows share
+    one pool of `workers` threads and, if rate is set, one bandwidth cap in
+    bytes per second. Given a transcode.Transcoder, each download is handed
+    to it as soon as it completes, and the manifest lists the compact files.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.workers = kwargs.get('workers', 4)
+        self.rate = kwargs.get('rate', None)
+        self.client = kwargs.get('client', None)
+        self.verbose = kwargs.get('verbose', True)
+        self.transcoder = kwargs.get('transcoder', None)
+        from .download import Downloader, Throttle
+        throttle = Throttle(self.rate) if self.rate else None
+        self.downloader = Downloader(client=self.client, throttle=throttle)
+
+    def run(self, shows):
+        """Syncs shows, a dict of directory -> Show. Returns dict of directory -> manifest."""
+        jobs = []
+        manifests = {}
+        order = {}
+        for directory, show in shows.items():
+            os.makedirs(directory, exist_ok=True)
+            show.prefetch(workers=self.workers)
+            manifests[directory] = self._manifest(directory, show)
+            order[directory] = [e.url for e in show.episodes]
+            for episode in show.episodes:
+                if episode.url in show.failures:
+                    continue
+                jobs.append((directory, episode))
+
+        results = utils.map_concurrently(self._download, jobs, self.workers)
+        for (directory, episode), (value, error) in zip(jobs, results):
+            if error is not None:
+                self._log("Failed: {} ({})".format(episode.url, error))
+                continue
+            path, transcode = value
+            if transcode is not None:
+                try:
+                    result = transcode.result()
+                except Exception as e:
+                    self._log("Keeping {} ({})".format(path, e))
+                else:
+                    path = result.path
+                    self._log("Transcoded {}".format(result))
+            manifests[directory]['episodes'][episode.url] = {
+                'url': episode.url,
+                'title': episode.title,
+                'program': episode.program,
+                'date': episode.date,
+                'duration': episode.duration,
+                'file': os.path.basename(path),
+            }
+
+        for directory, manifest in manifests.items():
+            # Current feed order first, then episodes kept from earlier syncs.
+            episodes = manifest['episodes']
+            urls = [u for u in order[directory] if u in episodes]
+            urls += [u for u in episodes if u not in urls]
+            manifest['episodes'] = [episodes[u] for u in urls
+                                    if os.path.exists(os.path.join(directory, episodes[u]['file']))]
+            write_manifest(directory, manifest)
+        return manifests
+
+    def _manifest(self, directory, show):
+        previous = read_manifest(directory) or {}
+        episodes = dict((e['url'], e) for e in previous.get('episodes', []))
+        return {
+            'title': show.title,
+            'date': show.date,
+            'feed': show.feed,
+            'synced_at': time.time(),
+            'episodes': episodes,
+        }
+
+    def _download(self, job):
+        """Returns the episode's local path, and a Future if it's being transcoded."""
+        directory, episode = job
+        path = os.path.join(directory, filename_for(episode))
+        if self.transcoder is not None:
+            compact = self.transcoder.output_for(path)
+            if os.path.exists(compact):
+                return compact, None
+        if not os.path.exists(path):
+            result = self.downloader.download(episode.mp3, path)
+            self._log("Downloaded {}".format(result))
+        if self.transcoder is not None:
+            # Transcodes overlap the remaining downloads; run() collects them.
+            return path, self.transcoder.submit(path)
+        return path, None
+
+    def _log(self, msg):
+        if self.verbose:
+            print(msg)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import threading
+import collections
+from contextlib import contextmanager
+
+
+class Span(object):
+    """A timed step; attrs holds details such as the URL or bytes transferred."""
+
+    __slots__ = ('name', 'start', 'duration', 'thread', 'attrs')
+
+    def __init__(self, name, start, thread, attrs):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.thread = thread
+        self.attrs = attrs
+
+
+class Tracer(object):
+    """Records spans and counters for every network and parse step.
+
+    Disabled by default, in which case span() and count() do almost nothing.
+    `npr --profile` enables it and prints summary() on exit, and `--trace FILE`
+    writes export_trace() output, which chrome://tracing and Perfetto load.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.counters = collections.Counter()
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    def reset(self):
+        """Disables tracing and drops everything recorded so far."""
+        self.enabled = False
+        with self._lock:
+            self.spans = []
+            self.counters = collections.Counter()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Times the enclosed block; yields a dict the block may add attrs to."""
+        if not self.enabled:
+            yield attrs
+            return
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, start, time.perf_counter() - start, **attrs)
+
+    def record(self, name, start, duration, **attrs):
+        """Adds a span measured by the caller, e.g. one spanning a generator's yields."""
+        if not self.enabled:
+            return
+        span = Span(name, start, threading.get_ident(), attrs)
+        span.duration = duration
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def summary(self):
+        """Returns a table of time, calls and bytes per span name, plus counters."""
+        rows = collections.OrderedDict()
+        for span in sorted(self.spans, key=lambda s: s.start):
+            row = rows.setdefault(span.name, [0, 0.0, 0.0, 0])
+            row[0] += 1
+            row[1] += span.duration
+            row[2] = max(row[2], span.duration)
+            row[3] += span.attrs.get('bytes', 0)
+        lines = ["{:<22} {:>6} {:>11} {:>10} {:>10}".format(
+            'span', 'calls', 'total ms', 'max ms', 'KiB')]
+        for name, (calls, total, longest, size) in rows.items():
+            lines.append("{:<22} {:>6} {:>11.1f} {:>10.1f} {:>10.1f}".format(
+                name, calls, total * 1000, longest * 1000, size / 1024.0))
+        if self.counters:
+            lines.append('')
+            for name, value in sorted(self.counters.items()):
+                lines.append("{:<22} {:>6}".format(name, value))
+        return '\n'.join(lines)
+
+    def export_trace(self):
+        """Returns spans and counters in the Trace Event Format, as a dict."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': pid,
+                'tid': span.thread,
+                'args': dict((k, v) for k, v in span.attrs.items()
+                             if isinstance(v, (str, int, float, bool, type(None)))),
+            })
+        events.append({'name': 'counters', 'ph': 'C', 'ts': 0, 'pid': pid,
+                       'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def report(self, trace_path=None, out=None):
+        """Prints the summary and, if trace_path is given, writes the trace there."""
+        out = out or sys.stderr
+        print("\n" + self.summary(), file=out)
+        if trace_path:
+            with open(trace_path, 'w') as f:
+                json.dump(self.export_trace(), f)
+
+
+tracer = Tracer()
+span = tracer.span
+record = tracer.record
+count = tracer.count
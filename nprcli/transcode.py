@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import TranscodeError
+
+
+# container ffmpeg writes for each output extension
+FORMATS = {
+    '.opus': 'opus',
+    '.ogg': 'ogg',
+    '.mp3': 'mp3',
+    '.m4a': 'ipod',
+}
+
+
+def compact_path(path, ext='.opus'):
+    """Returns where the compact version of the audio at path is kept."""
+    return os.path.splitext(path)[0] + '.compact' + ext
+
+
+class TranscodeResult(object):
+    """Outcome of a completed transcode."""
+
+    def __init__(self, source, path, source_size, size, elapsed):
+        self.source = source
+        self.path = path
+        self.source_size = source_size
+        self.size = size
+        self.elapsed = elapsed
+
+    @property
+    def ratio(self):
+        """Size of the compact file as a fraction of the original."""
+        return self.size / float(self.source_size) if self.source_size else 0.0
+
+    def __str__(self):
+        return "{} ({:.1f} MB -> {:.1f} MB in {:.1f}s)".format(
+            self.path, self.source_size / 1048576.0, self.size / 1048576.0, self.elapsed)
+
+
+class Transcoder(object):
+    """Converts downloaded audio to a compact low-bitrate mono file with ffmpeg.
+
+    The defaults suit speech: 24 kbit/s mono Opus is a fraction of the size of
+    NPR's MP3s. Each file is one single-threaded ffmpeg process, and up to
+    `workers` of them run at once, one per core by default. submit() blocks
+    while `queue_size` files are already waiting, so a fast producer such as
+    a sync can't pile up unbounded work. The output goes to compact_path() of
+    the source, which is how Player and Show find it; with keep_original
+    False the source is removed once the compact file is in place.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.ffmpeg = kwargs.get('ffmpeg', None) or shutil.which('ffmpeg')
+        self.workers = kwargs.get('workers', None) or os.cpu_count() or 1
+        self.queue_size = kwargs.get('queue_size', None) or 2 * self.workers
+        self.bitrate = kwargs.get('bitrate', '24k')
+        self.channels = kwargs.get('channels', 1)
+        self.codec = kwargs.get('codec', 'libopus')
+        self.ext = kwargs.get('ext', '.opus')
+        self.keep_original = kwargs.get('keep_original', True)
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def available(self):
+        return bool(self.ffmpeg)
+
+    def output_for(self, source):
+        return compact_path(source, self.ext)
+
+    def command(self, source, path):
+        return [self.ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+                '-i', source, '-vn', '-ac', str(self.channels),
+                '-c:a', self.codec, '-b:a', self.bitrate, '-threads', '1',
+                '-f', FORMATS.get(self.ext, self.ext.lstrip('.')), path]
+
+    def transcode(self, source, path=None):
+        """Transcodes source now, returning a TranscodeResult.
+
+        Raises TranscodeError if ffmpeg is missing or fails; no partial
+        output is left behind.
+        """
+        if not self.available:
+            raise TranscodeError('ffmpeg not found')
+        path = path or self.output_for(source)
+        tmp = path + '.part'
+        start = time.time()
+        try:
+            proc = subprocess.run(self.command(source, tmp), stdin=subprocess.DEVNULL,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise TranscodeError(e)
+        if proc.returncode != 0 or not os.path.exists(tmp):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            reason = proc.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise TranscodeError(reason[-1] if reason else 'ffmpeg exited with {}'.format(proc.returncode))
+        os.replace(tmp, path)
+        source_size = os.path.getsize(source)
+        if not self.keep_original:
+            os.remove(source)
+        return TranscodeResult(source, path, source_size, os.path.getsize(path), time.time() - start)
+
+    def submit(self, source, path=None):
+        """Queues source for transcoding, returning a Future of its TranscodeResult."""
+        self._slots.acquire()
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                future = self._pool.submit(self.transcode, source, path)
+            except Exception:
+                self._slots.release()
+                raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self, wait=True):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
@@ -1,77 +1,219 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import termios, fcntl, sys, os
-import threading
+import termios, fcntl, sys, os, subprocess
 import time
+import threading
+import selectors
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-from bs4 import BeautifulSoup
 
+_lock_guard = threading.Lock()
 
-def lazyproperty(fn):
-    """Decorator for making a method a lazy attribute."""
-    # Yanked from http://stackoverflow.com/a/3013910/140800
-    attr_name = '_lazy_' + fn.__name__
-    @property
-    def _lazyproperty(self):
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
-    return _lazyproperty
+def _lock_for(obj, name):
+    """Returns the lock guarding lazy attribute name on obj, creating it once."""
+    locks = getattr(obj, '_lazy_locks', None)
+    if locks is None:
+        with _lock_guard:
+            locks = getattr(obj, '_lazy_locks', None)
+            if locks is None:
+                locks = {}
+                setattr(obj, '_lazy_locks', locks)
+    lock = locks.get(name)
+    if lock is None:
+        with _lock_guard:
+            lock = locks.setdefault(name, threading.Lock())
+    return lock
 
-def get_next_item(playlist, item):
-    """Accepts list and optional current item, returns next item in list."""
-    try:
-        return playlist[playlist.index(item) + 1]
-    except (IndexError, ValueError) as e:
-        return playlist[0]
+class lazyproperty(object):
+    """Decorator for making a method a lazy attribute.
+
+    The first access computes the value under a per-instance lock, so threads
+    racing for it wait for that single call rather than repeating it; errors
+    are not cached. Given a ttl in seconds, the value is recomputed once it is
+    older than that. `del obj.name` or invalidate(obj) drops a cached value
+    early, e.g. to release something large once it has been used.
+
+        @lazyproperty
+        def title(self): ...
+
+        @lazyproperty(ttl=300)
+        def episodes(self): ...
+    """
+
+    def __init__(self, fn=None, ttl=None):
+        self.ttl = ttl
+        if fn is not None:
+            self(fn)
+
+    def __call__(self, fn):
+        self.fn = fn
+        self.__name__ = fn.__name__
+        self.__doc__ = fn.__doc__
+        self.attr_name = '_lazy_' + fn.__name__
+        return self
+
+    def _cached(self, obj):
+        entry = getattr(obj, self.attr_name, None)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            return None
+        return entry
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        entry = self._cached(obj)
+        if entry is not None:
+            return entry[0]
+        with _lock_for(obj, self.attr_name):
+            entry = self._cached(obj)
+            if entry is not None:
+                return entry[0]
+            value = self.fn(obj)
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            setattr(obj, self.attr_name, (value, expires))
+            return value
+
+    def __set__(self, obj, value):
+        raise AttributeError("can't set lazy attribute {}".format(self.__name__))
+
+    def __delete__(self, obj):
+        try:
+            delattr(obj, self.attr_name)
+        except AttributeError:
+            pass
+
+def invalidate(obj, *names):
+    """Drops cached values of obj's lazy attributes, or just of names if given."""
+    if not names:
+        names = [name for cls in type(obj).__mro__ for name, attr in vars(cls).items()
+                 if isinstance(attr, lazyproperty)]
+    for name in names:
+        delattr(obj, name)
 
-def get_previous_item(playlist, item):
-    """Accepts list and optional current item, returns previous item in list."""
+def map_concurrently(fn, items, workers=8):
+    """Calls fn on each item using a bounded pool of threads.
+
+    Returns a list of (result, error) tuples in the same order as items, so one
+    failing call doesn't abort the rest of the batch.
+    """
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as pool:
+        return list(pool.map(call, items))
+
+def resolve_ahead(fn, items, workers=8):
+    """Yields (item, error) for items in order, calling fn on them in background threads.
+
+    Up to `workers` items beyond the one being yielded are in flight at once,
+    and items are only pulled from the iterable as that window advances.
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    pending = collections.deque()
+    items = iter(items)
     try:
-        return playlist[playlist.index(item) - 1]
-    except (IndexError, ValueError) as e:
-        return playlist[0]
-
-def download_file(url):
-    """Downloads file at given URL. Names file whatever's after last slash in URL."""
-    # Thanks http://stackoverflow.com/questions/16694907/how-to-download-large-file-in-python-with-requests-py
-    print("Downloading URL: %s" % url)
-    local_filename = url.split('/')[-1]
-    r = requests.get(url, stream=True)
-    with open(local_filename, 'wb') as f:
-        for chunk in r.iter_content(chunk_size=1024): 
-            if chunk: # filter out keep-alive new chunks
-                f.write(chunk)
-                f.flush()
+        while True:
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) > workers:
+                    break
+            if not pending:
+                return
+            item, future = pending.popleft()
+            yield item, future.exception()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+def download_file(url, path=None, client=None, cancel=None, verbose=True, segments=1,
+                  progress=None, expected_size=None, checksum=None, transcoder=None):
+    """Downloads file at given URL, by default named whatever's after last slash in URL.
+
+    See download.Downloader for resuming, segments and verification. Returns
+    the local filename, or None if cancel was set before the download finished.
+    Given a transcode.Transcoder, the file is then converted and the compact
+    file's name is returned instead.
+    """
+    from .download import Downloader
+    if verbose:
+        print("Downloading URL: %s" % url)
+    local_filename = path or url.split('/')[-1].split('?')[0]
+    downloader = Downloader(client=client, segments=segments, progress=progress)
+    result = downloader.download(url, local_filename, expected_size=expected_size,
+                                 checksum=checksum, cancel=cancel)
+    if result is None:
+        return None
+    if verbose:
+        print("Downloaded {}".format(result))
+    if transcoder is not None:
+        result = transcoder.transcode(local_filename)
+        if verbose:
+            print("Transcoded {}".format(result))
+        return result.path
     return local_filename
 
-def listen_for_keypress(dispatch_table, proc):
-    """Loop listening for input, call functions according to dispatch_table."""
+def listen(dispatch_table, watches=None, stdin=None):
+    """Event loop calling dispatch_table handlers for keys typed on stdin.
+
+    watches maps other file descriptors to callbacks, run whenever the fd is
+    readable; the loop returns when one of them returns True. Blocks in
+    select(), so keys are handled as soon as they're typed and no CPU is used
+    while idle.
+    """
     # Straight out of the docs: https://docs.python.org/2/faq/library.html#how-do-i-get-a-single-keypress-at-a-time
-    fd = sys.stdin.fileno()
+    fd = (stdin or sys.stdin).fileno()
 
-    oldterm = termios.tcgetattr(fd)
-    newattr = termios.tcgetattr(fd)
-    newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
-    termios.tcsetattr(fd, termios.TCSANOW, newattr)
+    oldterm = None
+    if os.isatty(fd):
+        oldterm = termios.tcgetattr(fd)
+        newattr = termios.tcgetattr(fd)
+        newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
+        termios.tcsetattr(fd, termios.TCSANOW, newattr)
 
     oldflags = fcntl.fcntl(fd, fcntl.F_GETFL)
     fcntl.fcntl(fd, fcntl.F_SETFL, oldflags | os.O_NONBLOCK)
 
+    selector = selectors.DefaultSelector()
+    try:
+        selector.register(fd, selectors.EVENT_READ)
+    except PermissionError:
+        # Regular files and /dev/null can't be polled; there are no keys to read.
+        pass
+    for watch, callback in (watches or {}).items():
+        selector.register(watch, selectors.EVENT_READ, callback)
     try:
-        while proc.poll() == None:
-            time.sleep(0.5)
-            try:
-                c = sys.stdin.read(1)
-                f = dispatch_table[c]
-                f()
-            except IOError: pass
-            except KeyError: pass
-        f = dispatch_table['n']
-        f()
+        while True:
+            for key, _ in selector.select():
+                if key.data is not None:
+                    if key.data():
+                        return
+                    continue
+                try:
+                    data = os.read(fd, 1024)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                if not data:
+                    selector.unregister(fd)
+                    continue
+                for c in data.decode('utf-8', 'ignore'):
+                    f = dispatch_table.get(c)
+                    if f:
+                        f()
     finally:
-        termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
+        selector.close()
+        if oldterm is not None:
+            termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
         fcntl.fcntl(fd, fcntl.F_SETFL, oldflags)
 
 def popen_with_callback(callback, popen_args):
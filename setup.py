@@ -8,11 +8,10 @@ except ImportError:
     from distutils.core import setup
 
 
-readme = open('README.rst').read()
-history = open('HISTORY.rst').read().replace('.. :changelog:', '')
+readme = open('README.md').read()
 
 requirements = [
-    # TODO: put package requirements here
+    'requests',
 ]
 
 test_requirements = [
@@ -23,7 +22,8 @@ setup(
     name='nprcli',
     version='0.1.0',
     description='Command-line NPR podcast player.',
-    long_description=readme + '\n\n' + history,
+    long_description=readme,
+    long_description_content_type='text/markdown',
     author='Conor Schaefer',
     author_email='conor.schaefer@gmail.com',
     url='https://github.com/ronocdh/nprcli',
@@ -34,6 +34,7 @@ setup(
                  'nprcli'},
     include_package_data=True,
     install_requires=requirements,
+    python_requires='>=3.7',
     license="BSD",
     zip_safe=False,
     keywords='nprcli',
@@ -42,15 +43,18 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Natural Language :: English',
-        "Programming Language :: Python :: 2",
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     test_suite='tests',
     tests_require=test_requirements,
-    scripts=["nprcli"],
+    entry_points={
+        'console_scripts': ['npr = nprcli.cli:main'],
+    },
 )
 
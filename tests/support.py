@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in HTTP server for tests that would otherwise hit npr.org."""
+
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append((self.command, self.path, dict(self.headers)))
+        route = stub.routes.get(self.path)
+        if route is None:
+            status, headers, content = 404, {}, b'not found'
+        elif callable(route):
+            status, headers, content = route(self)
+        else:
+            status, headers, content = 200, {}, route
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if body and content:
+            self.wfile.write(content)
+
+
+class StubServer(object):
+    """Serves a dict of path -> body (or path -> callable) on localhost.
+
+    A callable route receives the request handler and returns a
+    (status, headers, body) tuple.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def paths(self, method='GET'):
+        return [p for m, p, _ in self.requests if m == method]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def ranged(content, ranges=True):
+    """Route serving content with HTTP Range support, like a CDN serving MP3s."""
+    def route(handler):
+        headers = {'Accept-Ranges': 'bytes'} if ranges else {}
+        spec = handler.headers.get('Range')
+        if not ranges or not spec or not spec.startswith('bytes='):
+            return 200, headers, content
+        first, _, last = spec[len('bytes='):].partition('-')
+        first = int(first)
+        last = int(last) if last else len(content) - 1
+        if first >= len(content):
+            headers['Content-Range'] = 'bytes */{}'.format(len(content))
+            return 416, headers, b''
+        last = min(last, len(content) - 1)
+        headers['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, len(content))
+        return 206, headers, content[first:last + 1]
+    return route
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+test_cache
+----------------------------------
+
+Tests for `nprcli.cache` and cached fetches through `nprcli.client`.
+"""
+
+import time
+import shutil
+import tempfile
+import unittest
+
+from nprcli.cache import HTTPCache
+from nprcli.client import Client
+from nprcli.exceptions import NetworkError
+
+from .support import StubServer
+
+
+class TestHTTPCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cache = HTTPCache(path=self.path, max_size=100)
+
+    def test_store_and_get(self):
+        self.cache.store('http://npr.test/a', b'body', {'ETag': '"v1"'})
+        meta, body = self.cache.get('http://npr.test/a')
+        self.assertEqual(body, b'body')
+        self.assertEqual(self.cache.validators(meta), {'If-None-Match': '"v1"'})
+        self.assertIsNone(self.cache.get('http://npr.test/b'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.store('http://npr.test/a', b'a' * 60)
+        time.sleep(0.01)
+        self.cache.store('http://npr.test/b', b'b' * 60)
+        self.assertIsNone(self.cache.get('http://npr.test/a'))
+        self.assertIsNotNone(self.cache.get('http://npr.test/b'))
+        self.assertLessEqual(self.cache.size(), 100)
+
+
+class TestCachedFetch(unittest.TestCase):
+
+    def setUp(self):
+        def feed(handler):
+            if handler.headers.get('If-None-Match') == '"v1"':
+                return 304, {'ETag': '"v1"'}, b''
+            return 200, {'ETag': '"v1"'}, b'<rss/>'
+        self.server = StubServer({'/feed': feed}).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.client = Client(hosts={'npr.test': self.server.url}, retries=0,
+                             cache=HTTPCache(path=self.path))
+
+    def test_fresh_entries_skip_network(self):
+        self.client.fetch('http://npr.test/feed', ttl=60)
+        self.client.fetch('http://npr.test/feed', ttl=60)
+        self.assertEqual(len(self.server.paths()), 1)
+
+    def test_stale_entries_revalidate(self):
+        self.client.fetch('http://npr.test/feed', ttl=0)
+        body = self.client.fetch('http://npr.test/feed', ttl=0)
+        self.assertEqual(body, b'<rss/>')
+        self.assertEqual(self.server.requests[1][2].get('If-None-Match'), '"v1"')
+
+    def test_no_ttl_bypasses_cache(self):
+        self.client.fetch('http://npr.test/feed')
+        self.assertIsNone(self.client.cache.get('http://npr.test/feed'))
+
+    def test_serves_stale_body_when_offline(self):
+        self.client.fetch('http://npr.test/feed', ttl=0)
+        del self.server.routes['/feed']
+        self.assertEqual(self.client.fetch('http://npr.test/feed', ttl=0), b'<rss/>')
+        with self.assertRaises(NetworkError):
+            self.client.fetch('http://npr.test/other', ttl=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+test_catalog
+----------------------------------
+
+Tests for `nprcli.catalog`, against a local stand-in server.
+"""
+
+import os
+import time
+import datetime
+import shutil
+import tempfile
+import unittest
+
+from nprcli.catalog import Catalog, find_playable_show, recent_programs
+from nprcli.exceptions import AudioNotAvailable, NetworkError
+from nprcli.client import Client
+from nprcli.index import EpisodeIndex
+from nprcli.refresh import Refresher
+
+from . import test_models
+from .support import StubServer
+
+FEED = """<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>{items}</channel></rss>"""
+ITEM = """<item><title>{name} {day}</title><link>http://npr.test/{slug}/{day}</link>
+<pubDate>{day:02d} Jan 2015 {hour:02d}:00:00 -0500</pubDate>
+<enclosure url="http://npr.test/{slug}/{day}.mp3" type="audio/mpeg"/></item>"""
+
+UNPOSTED = """<item><title>{name} {day}</title><link>http://npr.test/{slug}/{day}</link>
+<pubDate>{day:02d} Jan 2015 {hour:02d}:00:00 -0500</pubDate></item>"""
+
+
+def feed(name, slug, hour, days):
+    items = ''.join(ITEM.format(name=name, slug=slug, day=d, hour=hour) for d in days)
+    return FEED.format(name=name, items=items).encode('utf-8')
+
+def slow(content, delay=0.3):
+    def route(handler):
+        time.sleep(delay)
+        return 200, {}, content
+    return route
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({
+            '/me': slow(feed('Morning Edition', 'me', 5, [6, 5])),
+            '/atc': slow(feed('All Things Considered', 'atc', 16, [5, 4])),
+            '/fa': slow(feed('Fresh Air', 'fa', 12, [6])),
+        }).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.catalog = Catalog(
+            path=os.path.join(self.dir, 'subscriptions.json'),
+            subscriptions=['http://npr.test/me', 'http://npr.test/atc', 'http://npr.test/fa'],
+            client=Client(hosts={'npr.test': self.server.url}, retries=0),
+            index=EpisodeIndex(path=':memory:'))
+
+    def test_refresh_is_concurrent(self):
+        start = time.time()
+        shows = self.catalog.refresh()
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual([s.title for s in shows.values()],
+                         ['Morning Edition', 'All Things Considered', 'Fresh Air'])
+
+    def test_failures_are_per_feed(self):
+        self.catalog.subscribe('http://npr.test/missing')
+        self.catalog.refresh()
+        self.assertEqual(list(self.catalog.failures), ['http://npr.test/missing'])
+        self.assertEqual(len(self.catalog.shows), 3)
+
+    def test_merged_episodes_newest_first(self):
+        titles = [e.title for e in self.catalog.episodes()]
+        self.assertEqual(titles, ['Fresh Air 6', 'Morning Edition 6', 'All Things Considered 5',
+                                  'Morning Edition 5', 'All Things Considered 4'])
+
+    def test_unzoned_dates_sort_with_the_rest(self):
+        self.server.routes['/fa'] = feed('Fresh Air', 'fa', 12, [6]).replace(b'-0500', b'-0000')
+        titles = [e.title for e in self.catalog.episodes()]
+        self.assertEqual(titles[:2], ['Fresh Air 6', 'Morning Edition 6'])
+
+    def test_refresh_takes_as_long_as_slowest_feed(self):
+        for n in range(12):
+            self.server.routes['/slow{}'.format(n)] = slow(feed('Slow', 'slow{}'.format(n), 9, [6]))
+            self.catalog.subscribe('http://npr.test/slow{}'.format(n))
+        start = time.time()
+        self.catalog.refresh()
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(len(self.catalog.shows), 15)
+
+    def test_subscriptions_persist(self):
+        self.catalog.subscribe('fresh_air')
+        self.catalog.unsubscribe('http://npr.test/fa')
+        self.catalog.save()
+        catalog = Catalog(path=self.catalog.path)
+        self.assertEqual(catalog.subscriptions,
+                         ['http://npr.test/me', 'http://npr.test/atc', 'fresh_air'])
+        with self.assertRaises(KeyError):
+            catalog.subscribe('no_such_program')
+
+
+class TestFindPlayableShow(unittest.TestCase):
+
+    SUNDAY = datetime.date(2015, 1, 4)
+
+    def setUp(self):
+        sunday = test_models.FEED.replace(b'Morning Edition', b'Weekend Edition Sunday')
+        saturday = test_models.FEED.replace(b'Morning Edition', b'Weekend Edition Saturday')
+        self.server = StubServer({
+            '/rss/rss.php?id=10': slow(sunday, 0.2),
+            '/rss/rss.php?id=7': slow(saturday.replace(b'npr.test/story/', b'npr.test/sat/'), 0.2),
+            '/rss/rss.php?id=3': slow(test_models.FEED, 0.2),
+            '/story/1': test_models.page(1, audio=False),
+            '/story/2': test_models.page(2, audio=False),
+            '/story/3': test_models.page(3, audio=False),
+            '/sat/1': test_models.page(1, audio=False),
+            '/sat/2': test_models.page(2),
+        }).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'npr.test': self.server.url, 'www.npr.org': self.server.url},
+                             retries=0)
+
+    def find(self, **kwargs):
+        return find_playable_show(today=self.SUNDAY, client=self.client,
+                                  index=EpisodeIndex(path=':memory:'), **kwargs)
+
+    def test_recent_programs(self):
+        self.assertEqual(recent_programs(self.SUNDAY), ['weekend_edition_sunday',
+                                                        'weekend_edition_saturday',
+                                                        'morning_edition'])
+
+    def test_falls_back_to_previous_edition(self):
+        start = time.time()
+        show = self.find()
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(show.title, 'Weekend Edition Saturday')
+
+    def test_prefers_today_when_available(self):
+        self.server.routes['/story/3'] = test_models.page(3)
+        self.assertEqual(self.find().title, 'Weekend Edition Sunday')
+
+    def test_nothing_available(self):
+        with self.assertRaises(AudioNotAvailable):
+            self.find(programs=['weekend_edition_sunday'])
+
+
+class TestEditionFallback(unittest.TestCase):
+
+    MONDAY = datetime.date(2015, 1, 5)
+
+    def setUp(self):
+        self.routes = {
+            '/rss/rss.php?id=10': feed('Weekend Edition Sunday', 'wes', 8, [4]),
+            '/me/5': test_models.page(5, audio=False),
+        }
+        self.server = StubServer(self.routes).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'npr.test': self.server.url, 'www.npr.org': self.server.url,
+                                    'feeds.npr.org': self.server.url}, retries=0)
+
+    def find(self, **kwargs):
+        return find_playable_show(today=self.MONDAY, client=self.client,
+                                  index=EpisodeIndex(path=':memory:'), **kwargs)
+
+    def morning_edition(self, items):
+        return FEED.format(name='Morning Edition', items=''.join(items)).encode('utf-8')
+
+    def test_falls_back_to_previous_edition_in_feed(self):
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            [UNPOSTED.format(name='Morning Edition', slug='me', day=5, hour=5)]
+            + [ITEM.format(name='Morning Edition', slug='me', day=2, hour=5)])
+        show = self.find()
+        self.assertEqual(show.title, 'Morning Edition')
+        self.assertEqual(show.edition, datetime.date(2015, 1, 2))
+        self.assertEqual([e.title for e in show.episodes], ['Morning Edition 2'])
+
+    def test_moves_on_once_the_new_edition_is_posted(self):
+        yesterday = ITEM.format(name='Morning Edition', slug='me', day=2, hour=5)
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            [UNPOSTED.format(name='Morning Edition', slug='me', day=5, hour=5), yesterday])
+        show = self.find(programs=['morning_edition'])
+        self.assertEqual(show.edition, datetime.date(2015, 1, 2))
+        show.episodes
+        refresher = Refresher([show], interval=60)
+        self.addCleanup(refresher.stop)
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            [ITEM.format(name='Morning Edition', slug='me/b', day=5, hour=6),
+             UNPOSTED.format(name='Morning Edition', slug='me', day=5, hour=5), yesterday])
+        self.assertEqual(refresher.poll(), 1)
+        self.assertEqual(show.edition, self.MONDAY)
+        (_, episodes), = refresher.read_updates()
+        self.assertEqual([e.url for e in episodes], ['http://npr.test/me/b/5'])
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            [ITEM.format(name='Morning Edition', slug='me/b', day=5, hour=6),
+             ITEM.format(name='Morning Edition', slug='me', day=5, hour=5), yesterday])
+        self.assertEqual(refresher.poll(), 1)
+        self.assertEqual([e.url for e in show.episodes], ['http://npr.test/me/5', 'http://npr.test/me/b/5'])
+
+    def test_checks_every_story_of_an_edition(self):
+        unposted = [UNPOSTED.format(name='Story', slug='me/' + s, day=5, hour=5) for s in 'abc']
+        for slug in 'abc':
+            self.routes['/me/{}/5'.format(slug)] = test_models.page(5, audio=False)
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            unposted + [ITEM.format(name='Story', slug='me/late', day=5, hour=6)])
+        show = self.find(probe=3)
+        self.assertEqual(show.edition, self.MONDAY)
+        self.assertEqual(show.episodes[-1].title, 'Story 5')
+
+    def test_falls_back_to_archive(self):
+        self.routes['/rss/rss.php?id=3'] = self.morning_edition(
+            [UNPOSTED.format(name='Morning Edition', slug='me', day=5, hour=5)])
+        self.routes['/3/rss.xml'] = feed('Morning Edition', 'archive', 5, [1])
+        show = self.find(programs=['morning_edition'])
+        self.assertEqual(show.feed, 'https://feeds.npr.org/3/rss.xml')
+        self.assertEqual(show.edition, datetime.date(2015, 1, 1))
+
+    def test_offline_is_not_missing_audio(self):
+        self.routes.clear()
+        with self.assertRaises(NetworkError):
+            self.find()
+
+
+if __name__ == '__main__':
+    unittest.main()
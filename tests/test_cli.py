@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+test_cli
+----------------------------------
+
+Tests for `nprcli.cli` startup cost, measured in a fresh interpreter, and
+its argument handling.
+"""
+
+import io
+import os
+import sys
+import json
+import argparse
+import shutil
+import tempfile
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+
+from nprcli import cli
+from nprcli.sync import write_manifest
+
+
+# `npr --help` and argument parsing must not pay for these
+HEAVY = ('requests', 'urllib3', 'sqlite3', 'xml', 'html', 'nprcli.models')
+
+# offline playback of a synced library must not pay for these either
+NETWORK = ('requests', 'urllib3', 'sqlite3', 'nprcli.client')
+
+PLAY_LIBRARY = """
+import sys, json
+from nprcli.backends import FakeBackend
+from nprcli.models import Player, Show
+from nprcli.resume import Resume
+player = Player(show=Show(library=sys.argv[1]), backend=FakeBackend(), verbose=False,
+                resume=Resume())
+if not player.resume_playback():
+    player.next_track()
+player.backend.position = 42.0
+player.track_position()
+player.resume.flush()
+print(json.dumps([player.now_playing.title, player.backend.calls, sorted(sys.modules)]))
+"""
+
+# Cumulative import time allowed for nprcli.cli, in microseconds; about ten
+# times what it takes on a laptop, so only a new eager import trips it.
+BUDGET = 50000
+
+
+def run(code, *flags):
+    return subprocess.run([sys.executable] + list(flags) + ['-c', code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_cli_does_not_import_heavy_modules(self):
+        out = run('import sys, json, nprcli.cli; print(json.dumps(sorted(sys.modules)))').stdout
+        loaded = [m for m in json.loads(out)
+                  if any(m == h or m.startswith(h + '.') for h in HEAVY)]
+        self.assertEqual(loaded, [])
+
+    def test_import_time_budget(self):
+        err = run('import nprcli.cli', '-X', 'importtime').stderr
+        cumulative = None
+        for line in err.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if len(fields) == 3 and fields[2] == 'nprcli.cli':
+                cumulative = int(fields[1])
+        self.assertIsNotNone(cumulative)
+        self.assertLess(cumulative, BUDGET)
+
+    def test_package_exports_load_on_demand(self):
+        out = run('import sys, nprcli; print("nprcli.models" in sys.modules); '
+                  'nprcli.Player; print("nprcli.models" in sys.modules)').stdout
+        self.assertEqual(out.split(), ['False', 'True'])
+
+    def test_library_playback_stays_offline(self):
+        library = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, library)
+        with open(os.path.join(library, 'story-1.mp3'), 'wb') as f:
+            f.write(b'ID3')
+        write_manifest(library, {'title': 'Morning Edition', 'date': '2015-01-05', 'feed': None,
+                                 'episodes': [{'url': 'http://npr.test/story/1', 'title': 'Story 1',
+                                               'program': 'Morning Edition', 'date': None,
+                                               'file': 'story-1.mp3'}]})
+        env = dict(os.environ, XDG_CACHE_HOME=library)
+        for resumed in (False, True):
+            out = subprocess.run([sys.executable, '-c', PLAY_LIBRARY, library], env=env, check=True,
+                                 stdout=subprocess.PIPE, universal_newlines=True).stdout
+            title, calls, modules = json.loads(out)
+            self.assertEqual(title, 'Story 1')
+            self.assertEqual(['seek', 42.0] in calls, resumed)
+            self.assertEqual([m for m in modules
+                              if any(m == n or m.startswith(n + '.') for n in NETWORK)], [])
+
+
+class TestArguments(unittest.TestCase):
+
+    def test_bare_npr_refreshes_like_play(self):
+        self.assertEqual(cli._refresh(argparse.Namespace(command=None)), 300)
+        self.assertIsNone(cli._refresh(argparse.Namespace(command='play', refresh=0)))
+
+    def test_unknown_program_is_an_error(self):
+        for command in ('play', 'daemon'):
+            with self.assertRaises(SystemExit) as cm, redirect_stdout(io.StringIO()) as out:
+                cli._show(argparse.Namespace(command=command, library=None, program='typo'))
+            self.assertEqual(cm.exception.code, 2)
+            self.assertIn('Unknown program typo', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
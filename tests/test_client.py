@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+test_client
+----------------------------------
+
+Tests for `nprcli.client`, against a local stand-in server.
+"""
+
+import unittest
+
+from nprcli import client
+from nprcli.client import Client
+from nprcli.exceptions import NetworkError
+
+from .support import StubServer
+
+
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({'/a': b'alpha', '/b': b'bravo'}).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'www.npr.org': self.server.url},
+                             retries=2, backoff_factor=0)
+
+    def test_rewrites_hosts(self):
+        self.assertEqual(self.client.fetch('http://www.npr.org/a'), b'alpha')
+        self.assertEqual(self.client.rewrite('http://example.com/a'), 'http://example.com/a')
+
+    def test_reuses_connections(self):
+        for _ in range(5):
+            self.client.fetch('http://www.npr.org/a')
+            self.client.fetch('http://www.npr.org/b')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_server_errors(self):
+        attempts = []
+        def flaky(handler):
+            attempts.append(handler.path)
+            if len(attempts) < 3:
+                return 503, {}, b''
+            return 200, {}, b'ok'
+        self.server.routes['/flaky'] = flaky
+        self.assertEqual(self.client.fetch('http://www.npr.org/flaky'), b'ok')
+        self.assertEqual(len(attempts), 3)
+
+    def test_fetch_raises_network_error(self):
+        with self.assertRaises(NetworkError):
+            self.client.fetch('http://www.npr.org/missing')
+
+    def test_set_client(self):
+        previous = client.set_client(self.client)
+        self.addCleanup(client.set_client, previous)
+        self.assertIs(client.get_client(), self.client)
+
+
+if __name__ == '__main__':
+    unittest.main()
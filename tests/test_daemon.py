@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+test_daemon
+----------------------------------
+
+Tests for `nprcli.daemon`, driving a Player with a fake backend over a socket.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nprcli.daemon import Daemon, send
+from nprcli.exceptions import DaemonError
+
+from . import test_models, test_prefetch
+from .test_player import PlayerTestCase
+
+
+class TestDaemon(PlayerTestCase):
+
+    def setUp(self):
+        super(TestDaemon, self).setUp()
+        self.server.routes['/story/9'] = test_models.page(9)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = os.path.join(tmp, 'daemon.sock')
+        self.player.stdin = open(os.devnull, 'rb')
+        self.addCleanup(self.player.stdin.close)
+        self.daemon = Daemon(self.player, path=self.path)
+        self.daemon.bind()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+        self.addCleanup(self.stop)
+
+    def serve(self):
+        try:
+            self.daemon.serve()
+        except SystemExit:
+            pass
+
+    def stop(self):
+        if self.thread.is_alive():
+            send('quit', path=self.path)
+        self.thread.join(5)
+
+    def send(self, command, *args):
+        return send(command, *args, path=self.path)
+
+    def test_status_and_navigation(self):
+        state = self.send('status')
+        self.assertEqual(state['now_playing']['title'], 'Story 1')
+        self.assertEqual(state['position'], 0)
+        self.assertEqual(self.send('next')['now_playing']['title'], 'Story 2')
+        self.assertEqual(self.send('previous')['position'], 0)
+        self.assertEqual(self.send('jump', 2)['now_playing']['title'], 'Story 3')
+
+    def test_queue(self):
+        result = self.send('queue', 'http://npr.test/story/9', 'http://npr.test/story/404')
+        self.assertEqual(result['queued'], ['http://npr.test/story/9'])
+        self.assertEqual(list(result['failed']), ['http://npr.test/story/404'])
+        titles = [e['title'] for e in self.send('playlist')['episodes']]
+        self.assertEqual(titles[-1], 'Story 9')
+
+    def test_queue_resolves_off_the_event_loop(self):
+        release = threading.Event()
+        def slow(handler):
+            release.wait(5)
+            return 200, {}, test_models.page(8)
+        self.server.routes['/story/8'] = slow
+        result = []
+        queuer = threading.Thread(target=lambda: result.append(self.send('queue', 'http://npr.test/story/8')))
+        queuer.start()
+        self.addCleanup(queuer.join, 5)
+        self.addCleanup(release.set)
+        self.assertTrue(test_prefetch.wait_for(lambda: '/story/8' in self.server.paths()))
+        status = send('status', path=self.path, timeout=1)
+        self.assertEqual(status['now_playing']['title'], 'Story 1')
+        release.set()
+        queuer.join(5)
+        self.assertEqual(result, [{'queued': ['http://npr.test/story/8'], 'failed': {}}])
+        self.assertEqual(self.send('playlist')['episodes'][-1]['title'], 'Story 8')
+
+    def test_errors_are_reported(self):
+        with self.assertRaises(DaemonError):
+            self.send('rewind')
+        self.assertEqual(self.send('status')['position'], 0)
+
+    def test_quit_removes_socket(self):
+        self.assertIsNone(self.send('quit'))
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+        with self.assertRaises(DaemonError):
+            self.send('status')
+
+    def test_refuses_second_daemon(self):
+        with self.assertRaises(DaemonError):
+            Daemon(self.player, path=self.path).bind()
+
+
+if __name__ == '__main__':
+    unittest.main()
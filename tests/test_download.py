@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+test_download
+----------------------------------
+
+Tests for `nprcli.download`, against a local stand-in server.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+
+from nprcli import utils
+from nprcli.client import Client
+from nprcli.download import Downloader
+from nprcli.exceptions import DownloadError
+
+from .support import StubServer, ranged
+
+AUDIO = os.urandom(300 * 1024 + 7)
+URL = 'http://npr.test/episode.mp3'
+
+
+class TestDownloader(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({
+            '/episode.mp3': ranged(AUDIO),
+            '/norange.mp3': ranged(AUDIO, ranges=False),
+        }).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'npr.test': self.server.url}, retries=0)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'episode.mp3')
+
+    def read(self, path=None):
+        with open(path or self.path, 'rb') as f:
+            return f.read()
+
+    def ranges_requested(self):
+        return [h.get('Range') for m, p, h in self.server.requests if m == 'GET']
+
+    def test_download(self):
+        seen = []
+        result = Downloader(client=self.client, progress=lambda d, t: seen.append((d, t))).download(
+            URL, self.path, expected_size=len(AUDIO),
+            checksum='sha256:' + hashlib.sha256(AUDIO).hexdigest())
+        self.assertEqual(self.read(), AUDIO)
+        self.assertEqual(result.size, len(AUDIO))
+        self.assertEqual(seen[-1], (len(AUDIO), len(AUDIO)))
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertGreater(result.throughput, 0)
+
+    def test_resumes_partial_file(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.write(AUDIO[:1000])
+        result = Downloader(client=self.client).download(URL, self.path)
+        self.assertEqual(self.read(), AUDIO)
+        self.assertEqual(result.resumed_from, 1000)
+        self.assertEqual(self.ranges_requested(), ['bytes=1000-'])
+
+    def test_restarts_when_range_ignored(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.write(b'x' * 1000)
+        result = Downloader(client=self.client).download('http://npr.test/norange.mp3', self.path)
+        self.assertEqual(self.read(), AUDIO)
+        self.assertEqual(result.resumed_from, 0)
+
+    def test_segmented(self):
+        result = Downloader(client=self.client, segments=4, min_segment_size=1024).download(
+            URL, self.path)
+        self.assertEqual(self.read(), AUDIO)
+        self.assertEqual(result.segments, 4)
+        self.assertEqual(len(self.ranges_requested()), 4)
+        self.assertFalse(os.path.exists(self.path + '.part.json'))
+
+    def test_segmented_resume_after_cancel(self):
+        cancel = threading.Event()
+        def progress(done, total):
+            if done > len(AUDIO) // 3:
+                cancel.set()
+        downloader = Downloader(client=self.client, segments=3, min_segment_size=1024,
+                                chunk_size=4096, progress=progress)
+        self.assertIsNone(downloader.download(URL, self.path, cancel=cancel))
+        self.assertTrue(os.path.exists(self.path + '.part.json'))
+        result = Downloader(client=self.client, segments=3).download(URL, self.path)
+        self.assertEqual(self.read(), AUDIO)
+        self.assertGreater(result.resumed_from, 0)
+
+    def test_segment_state_is_written_before_data(self):
+        seen = []
+        def progress(done, total):
+            seen.append(os.path.exists(self.path + '.part.json'))
+        Downloader(client=self.client, segments=3, min_segment_size=1024,
+                   progress=progress).download(URL, self.path)
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
+        self.assertEqual(self.read(), AUDIO)
+
+    def test_preallocated_file_is_not_resumed_as_stream(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.truncate(len(AUDIO))
+        with open(self.path + '.part.json', 'w') as f:
+            f.write('{"size": %d, "segments": [[0, %d, 0]]}' % (len(AUDIO), len(AUDIO)))
+        result = Downloader(client=self.client).download('http://npr.test/norange.mp3', self.path)
+        self.assertEqual(self.read(), AUDIO)
+        self.assertEqual(result.resumed_from, 0)
+        self.assertFalse(os.path.exists(self.path + '.part.json'))
+
+    def test_part_longer_than_file_restarts(self):
+        with open(self.path + '.part', 'wb') as f:
+            f.truncate(len(AUDIO) + 10)
+        Downloader(client=self.client).download(URL, self.path)
+        self.assertEqual(self.read(), AUDIO)
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(DownloadError):
+            Downloader(client=self.client).download(URL, self.path, checksum='sha256:00')
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+    def test_http_error(self):
+        with self.assertRaises(DownloadError):
+            Downloader(client=self.client).download('http://npr.test/missing.mp3', self.path)
+
+    def test_download_file(self):
+        path = utils.download_file(URL, path=self.path, client=self.client, verbose=False)
+        self.assertEqual(self.read(path), AUDIO)
+
+
+if __name__ == '__main__':
+    unittest.main()
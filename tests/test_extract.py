@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+test_extract
+----------------------------------
+
+Tests for `nprcli.extract`.
+"""
+
+import os
+import unittest
+
+from nprcli.extract import extract_fields
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+class TestExtractFields(unittest.TestCase):
+
+    def test_story_page(self):
+        fields = extract_fields(fixture('story.html'))
+        self.assertEqual(fields['title'], "Shaky Economy Tests Greece's Resolve")
+        self.assertEqual(fields['program'], 'Morning Edition')
+        self.assertEqual(fields['date'], 'January 5, 2015')
+        self.assertTrue(fields['mp3'].startswith('http://pd.npr.org/anon.npr-mp3/'))
+        self.assertIn('&topicId=1001', fields['mp3'])
+
+    def test_story_without_audio(self):
+        fields = extract_fields(fixture('story-noaudio.html'))
+        self.assertIsNone(fields['mp3'])
+        self.assertEqual(fields['program'], 'Morning Edition')
+
+    def test_nested_markup_and_multiple_classes(self):
+        fields = extract_fields(
+            '<div class="story storytitle"><div><h1>A <em>nested</em></h1></div> title</div>'
+            '<span class="date">Today</span>')
+        self.assertEqual(fields['title'], 'A nested title')
+        self.assertEqual(fields['date'], 'Today')
+        self.assertIsNone(fields['program'])
+
+    def test_download_link_needs_href(self):
+        fields = extract_fields('<a class="download">x</a><a class="download" href=" /a.mp3 ">y</a>')
+        self.assertEqual(fields['mp3'], '/a.mp3')
+
+    def test_first_match_wins(self):
+        page = fixture('story.html') + b'<div class="storytitle">Later</div'
+        self.assertEqual(extract_fields(page)['title'], "Shaky Economy Tests Greece's Resolve")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+test_feed
+----------------------------------
+
+Tests for `nprcli.feed`.
+"""
+
+import os
+import datetime
+import unittest
+
+from nprcli.feed import iter_items, parse_date, parse_duration
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+def chunked(content, size=256):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+class TestIterItems(unittest.TestCase):
+
+    def test_items_and_channel(self):
+        channel = {}
+        items = list(iter_items(chunked(fixture('morning_edition.xml')), channel))
+        self.assertEqual(len(items), 20)
+        self.assertEqual(items[0]['title'], "Shaky Economy Tests Greece's Resolve")
+        self.assertEqual(items[0]['link'], 'http://www.npr.org/2015/01/05/375000001/story-1')
+        self.assertIsNone(items[0]['mp3'])
+        self.assertEqual(channel['title'], 'Morning Edition')
+        self.assertEqual(channel['lastBuildDate'], 'Mon, 05 Jan 2015 06:02:00 -0500')
+
+    def test_yields_before_feed_is_complete(self):
+        content = fixture('morning_edition.xml')
+        fed = []
+        def chunks():
+            for chunk in chunked(content):
+                fed.append(len(chunk))
+                yield chunk
+        first = next(iter_items(chunks()))
+        self.assertEqual(first['link'], 'http://www.npr.org/2015/01/05/375000001/story-1')
+        self.assertLess(sum(fed), len(content) / 4)
+
+    def test_audio_enclosures(self):
+        items = list(iter_items([fixture('podcast.xml')]))
+        self.assertTrue(items[0]['mp3'].endswith('npr_375800001.mp3'))
+        self.assertTrue(items[1]['mp3'].endswith('npr_375700001.mp3'))
+        self.assertIsNone(items[2]['mp3'])
+        self.assertEqual([i['duration'] for i in items], [None, 2280, None])
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('2280'), 2280)
+        self.assertEqual(parse_duration('38:00'), 2280)
+        self.assertEqual(parse_duration('1:02:03'), 3723)
+        self.assertIsNone(parse_duration('soon'))
+        self.assertIsNone(parse_duration(None))
+
+    def test_parse_date_is_always_aware(self):
+        utc = datetime.datetime(2015, 1, 5, 10, tzinfo=datetime.timezone.utc)
+        self.assertEqual(parse_date('Mon, 05 Jan 2015 05:00:00 -0500'), utc)
+        self.assertEqual(parse_date('Mon, 05 Jan 2015 10:00:00 -0000').tzinfo, datetime.timezone.utc)
+        self.assertIsNone(parse_date('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
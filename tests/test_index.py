@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+test_index
+----------------------------------
+
+Tests for `nprcli.index`.
+"""
+
+import time
+import unittest
+
+from nprcli.index import EpisodeIndex
+
+
+class TestEpisodeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = EpisodeIndex(path=':memory:', max_age=60, retry_after=10)
+        self.fields = {'title': 'Story', 'program': 'Morning Edition',
+                       'date': 'January 5, 2015', 'mp3': 'http://npr.test/1.mp3'}
+
+    def test_put_and_get(self):
+        self.index.put('http://npr.test/1', self.fields)
+        self.assertEqual(self.index.get('http://npr.test/1'), self.fields)
+        self.assertIsNone(self.index.get('http://npr.test/2'))
+
+    def test_entries_without_audio_expire_sooner(self):
+        self.index.put('http://npr.test/1', self.fields)
+        self.index.put('http://npr.test/2', dict(self.fields, mp3=None))
+        later = time.time() + 30
+        entries = dict((e['url'], e) for e in self.index.entries())
+        self.assertFalse(self.index.is_stale(entries['http://npr.test/1'], later))
+        self.assertTrue(self.index.is_stale(entries['http://npr.test/2'], later))
+
+    def test_prune(self):
+        self.index.put('http://npr.test/1', self.fields)
+        self.index.put('http://npr.test/2', dict(self.fields, mp3=None))
+        self.index.retry_after = 0
+        self.assertEqual(self.index.prune(), 1)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.prune(older_than=0), 1)
+        self.assertEqual(len(self.index), 0)
+
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.index = EpisodeIndex(path=':memory:')
+        self.index.add_stories([
+            {'url': 'http://npr.test/1', 'title': 'Remembering A Jazz Great',
+             'program': 'Fresh Air', 'published': '2015-01-06T16:00:00-05:00',
+             'text': '<p>The pianist <b>recorded</b> for six decades.</p>'},
+            {'url': 'http://npr.test/2', 'title': 'Markets Rally',
+             'program': 'Morning Edition', 'published': '2015-01-05T05:00:00-05:00'},
+        ])
+
+    def urls(self, terms):
+        return [r['url'] for r in self.index.search(terms)]
+
+    def test_matches_titles_programs_and_text(self):
+        self.assertEqual(self.urls('jazz'), ['http://npr.test/1'])
+        self.assertEqual(self.urls('morning'), ['http://npr.test/2'])
+        self.assertEqual(self.urls('pianist recorded'), ['http://npr.test/1'])
+        self.assertEqual(self.urls('pian'), ['http://npr.test/1'])
+        self.assertEqual(self.urls('jazz markets'), [])
+        self.assertEqual(self.urls('b'), [])
+
+    def test_updates_in_place(self):
+        self.index.put('http://npr.test/2', {'title': None, 'program': None,
+                                             'date': 'January 5, 2015', 'mp3': 'http://npr.test/2.mp3'})
+        self.index.add_stories([{'url': 'http://npr.test/2', 'title': 'Stocks Rally'}])
+        result, = self.index.search('stocks')
+        self.assertEqual(result['program'], 'Morning Edition')
+        self.assertEqual(result['mp3'], 'http://npr.test/2.mp3')
+        self.assertEqual(self.urls('markets'), [])
+
+    def test_substring_fallback(self):
+        self.index.fts = False
+        self.assertEqual(self.urls('fresh pian'), ['http://npr.test/1'])
+        self.assertEqual(self.urls('air rally'), [])
+
+    def test_clear(self):
+        self.index.clear()
+        self.assertEqual(self.urls('jazz'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+test_models
+----------------------------------
+
+Tests for `nprcli.models`, without touching the network.
+"""
+
+import threading
+import unittest
+
+from nprcli.client import Client
+from nprcli.index import EpisodeIndex
+from nprcli.models import Show, Episode
+from nprcli.exceptions import AudioNotAvailable, NetworkError
+
+from .support import StubServer
+
+
+FEED = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+<title>Morning Edition</title>
+<lastBuildDate>Mon, 05 Jan 2015 05:00:00 -0500</lastBuildDate>
+<item><link>http://npr.test/story/1</link></item>
+<item><link>http://npr.test/story/2</link></item>
+<item><link>http://npr.test/story/3</link></item>
+</channel></rss>"""
+
+PODCAST = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+<title>Morning Edition</title>
+<item><title>Story 1</title><link>http://npr.test/story/1</link>
+<enclosure url="http://npr.test/1.mp3" type="audio/mpeg"/></item>
+</channel></rss>"""
+
+PAGE = """<html><body>
+<div class="storytitle"><h1>Story {n}</h1></div>
+<a class="program" href="/programs/morning-edition/">Morning Edition</a>
+<span class="date">January 5, 2015</span>
+{download}
+</body></html>"""
+
+
+def page(n, audio=True):
+    download = ''
+    if audio:
+        download = '<a class="download" href="http://npr.test/{0}.mp3">Download</a>'.format(n)
+    return PAGE.format(n=n, download=download).encode('utf-8')
+
+
+class ShowTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = {
+            '/feed': FEED,
+            '/story/1': page(1),
+            '/story/2': page(2, audio=False),
+            '/story/3': page(3),
+        }
+        self.server = StubServer(self.pages).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'npr.test': self.server.url}, retries=0)
+        self.index = EpisodeIndex(path=':memory:')
+
+    def show(self, **kwargs):
+        return Show(feed='http://npr.test/feed', client=self.client, index=self.index, **kwargs)
+
+
+class TestShowPrefetch(ShowTestCase):
+
+    def test_prefetch_keeps_feed_order(self):
+        show = self.show(prefetch=True, workers=3)
+        urls = [e.url for e in show.episodes]
+        self.assertEqual(urls, ['http://npr.test/story/1',
+                                'http://npr.test/story/2',
+                                'http://npr.test/story/3'])
+        self.assertEqual(show.episodes[0].title, 'Story 1')
+        self.assertEqual(show.episodes[2].mp3, 'http://npr.test/3.mp3')
+
+    def test_prefetch_isolates_failures(self):
+        del self.pages['/story/3']
+        show = self.show(prefetch=True)
+        show.episodes
+        self.assertEqual(sorted(show.failures), ['http://npr.test/story/2',
+                                                 'http://npr.test/story/3'])
+        self.assertIsInstance(show.failures['http://npr.test/story/2'], AudioNotAvailable)
+        self.assertIsInstance(show.failures['http://npr.test/story/3'], NetworkError)
+        self.assertEqual(show.episodes[0].mp3, 'http://npr.test/1.mp3')
+
+    def test_prefetch_fetches_each_page_once(self):
+        show = self.show(prefetch=True)
+        for e in show.episodes:
+            e.title
+        self.assertEqual(len(self.server.paths()), 4)
+
+
+class TestEpisodeIndex(ShowTestCase):
+
+    def test_second_show_skips_article_pages(self):
+        self.show(prefetch=True).episodes
+        requests = len(self.server.paths())
+        episodes = self.show().episodes
+        self.assertEqual(episodes[0].title, 'Story 1')
+        self.assertEqual(episodes[2].mp3, 'http://npr.test/3.mp3')
+        self.assertEqual(self.server.paths()[requests:], ['/feed'])
+
+    def test_missing_audio_is_rechecked(self):
+        self.show(prefetch=True).episodes
+        self.pages['/story/2'] = page(2)
+        self.index.retry_after = 0
+        self.assertEqual(self.show().episodes[1].mp3, 'http://npr.test/2.mp3')
+
+
+class TestShowFeed(ShowTestCase):
+
+    def test_channel_fields(self):
+        show = self.show()
+        self.assertEqual(show.title, 'Morning Edition')
+        self.assertEqual(str(show), 'Morning Edition (Mon, 05 Jan 2015 05:00:00 -0500)')
+
+    def test_enclosures_skip_article_pages(self):
+        self.pages['/podcast'] = PODCAST
+        show = Show(feed='http://npr.test/podcast', client=self.client, index=self.index)
+        episode = show.episodes[0]
+        self.assertEqual(episode.mp3, 'http://npr.test/1.mp3')
+        self.assertEqual(episode.title, 'Story 1')
+        self.assertEqual(self.server.paths(), ['/podcast'])
+
+    def test_feed_items_are_searchable(self):
+        self.pages['/podcast'] = PODCAST
+        list(Show(feed='http://npr.test/podcast', client=self.client, index=self.index).iter_episodes())
+        result, = self.index.search('story')
+        self.assertEqual(result['url'], 'http://npr.test/story/1')
+        self.assertEqual(result['program'], 'Morning Edition')
+
+    def test_partly_read_feed_is_searchable(self):
+        self.pages['/podcast'] = PODCAST.replace(b'</channel>', b"""<item><title>Story 2</title>
+<link>http://npr.test/story/2</link></item></channel>""")
+        show = Show(feed='http://npr.test/podcast', client=self.client, index=self.index)
+        next(show.iter_episodes())
+        self.assertEqual([r['url'] for r in self.index.search('story 2')], ['http://npr.test/story/2'])
+
+    def test_show_of_episodes(self):
+        episodes = [Episode('http://npr.test/story/3', client=self.client, index=self.index)]
+        show = Show.of(episodes, 'Search: story', client=self.client, index=self.index)
+        self.assertEqual(str(show), 'Search: story (1 episodes)')
+        self.assertEqual(list(show.iter_playable()), episodes)
+        self.assertEqual(self.server.paths(), ['/story/3'])
+
+
+class TestEpisode(ShowTestCase):
+
+    def episode(self, n, **kwargs):
+        return Episode('http://npr.test/story/{}'.format(n),
+                       client=self.client, index=self.index, **kwargs)
+
+    def test_is_compact(self):
+        self.assertFalse(hasattr(self.episode(1), '__dict__'))
+
+    def test_fills_unknown_fields_from_page(self):
+        episode = self.episode(1, title='From the feed')
+        self.assertEqual(episode.mp3, 'http://npr.test/1.mp3')
+        self.assertEqual(episode.title, 'From the feed')
+        self.assertEqual(episode.program, 'Morning Edition')
+        self.assertEqual(self.server.paths(), ['/story/1'])
+
+    def test_from_fields(self):
+        episode = Episode.from_fields('http://npr.test/story/2',
+                                      {'title': 'Story 2', 'program': None, 'date': None, 'mp3': None},
+                                      client=self.client, index=self.index)
+        self.assertIsNone(episode.program)
+        with self.assertRaises(AudioNotAvailable):
+            episode.mp3
+        self.assertEqual(self.server.paths(), [])
+
+    def test_concurrent_access_fetches_once(self):
+        episode = self.episode(3)
+        threads = [threading.Thread(target=lambda: episode.title) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(episode.title, 'Story 3')
+        self.assertEqual(self.server.paths(), ['/story/3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+test_player
+----------------------------------
+
+Tests for `nprcli.models.Player`, with a fake audio backend.
+"""
+
+import os
+import pty
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nprcli.backends import FakeBackend
+from nprcli.client import Client
+from nprcli.index import EpisodeIndex
+from nprcli.models import Player, Show
+from nprcli.prefetch import AudioCache, Prefetcher
+
+from . import test_models, test_prefetch
+from .support import StubServer
+
+ITEM = """<item><title>Story {0}</title><link>http://npr.test/story/{0}</link>
+<enclosure url="http://npr.test/{0}.mp3" type="audio/mpeg"/></item>"""
+
+FEED = ("""<?xml version="1.0"?><rss version="2.0"><channel><title>Morning Edition</title>"""
+        + ''.join(ITEM.format(i) for i in range(1, 4)) + "</channel></rss>").encode('utf-8')
+
+
+class PlayerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({'/feed': FEED}).__enter__()
+        self.addCleanup(self.server.__exit__)
+        client = Client(hosts={'npr.test': self.server.url}, retries=0)
+        self.show = Show(feed='http://npr.test/feed', client=client,
+                         index=EpisodeIndex(path=':memory:'))
+        self.backend = FakeBackend()
+        self.player = self.make_player()
+
+    def make_player(self, **kwargs):
+        kwargs.setdefault('prefetch', 0)
+        return Player(show=self.show, backend=self.backend, verbose=False, **kwargs)
+
+
+class TestPlayer(PlayerTestCase):
+
+    def test_next_track_loads_and_preloads(self):
+        self.player.next_track()
+        self.assertEqual(self.player.now_playing.title, 'Story 1')
+        self.assertEqual(self.backend.calls, [('load', 'http://npr.test/1.mp3'),
+                                              ('preload', 'http://npr.test/2.mp3')])
+
+    def test_finished_track_switches_to_preloaded(self):
+        self.player.next_track()
+        self.backend.finish()
+        self.assertFalse(self.player.handle_events())
+        self.assertEqual(self.player.now_playing.title, 'Story 2')
+        self.assertEqual(self.backend.calls[-1], ('preload', 'http://npr.test/3.mp3'))
+        self.assertEqual(len([c for c in self.backend.calls if c[0] == 'load']), 1)
+
+    def test_without_gapless_loads_next(self):
+        player = self.make_player(gapless=False)
+        player.next_track()
+        self.backend.finish()
+        player.handle_events()
+        self.assertEqual(self.backend.calls, [('load', 'http://npr.test/1.mp3'),
+                                              ('load', 'http://npr.test/2.mp3')])
+
+    def test_nothing_playable(self):
+        self.server.routes['/feed'] = b'<rss><channel><title>Morning Edition</title></channel></rss>'
+        self.player.next_track()
+        self.assertIsNone(self.player.now_playing)
+        self.assertEqual(self.backend.calls, [('stop',)])
+        self.backend.finish()
+        self.assertFalse(self.player.handle_events())
+
+    def test_keys_drive_the_backend(self):
+        master, slave = pty.openpty()
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        self.player.stdin = open(slave, 'rb', buffering=0, closefd=False)
+        self.addCleanup(self.player.stdin.close)
+        exited = []
+        def run():
+            try:
+                self.player.play()
+            except SystemExit:
+                exited.append(True)
+        thread = threading.Thread(target=run)
+        thread.start()
+        time.sleep(0.05)
+        os.write(master, b'np')
+        time.sleep(0.05)
+        os.write(master, b'q')
+        thread.join(5)
+        self.assertEqual(exited, [True])
+        loads = [c[1] for c in self.backend.calls if c[0] == 'load']
+        self.assertEqual(loads, ['http://npr.test/1.mp3', 'http://npr.test/2.mp3',
+                                 'http://npr.test/1.mp3'])
+
+
+class TestPlayerPrefetch(PlayerTestCase):
+
+    def setUp(self):
+        super(TestPlayerPrefetch, self).setUp()
+        self.server.routes['/feed'] = (
+            """<?xml version="1.0"?><rss version="2.0"><channel><title>Morning Edition</title>"""
+            + ''.join(ITEM.format(i) for i in range(1, 8)) + "</channel></rss>").encode('utf-8')
+        for i in range(1, 8):
+            self.server.routes['/{}.mp3'.format(i)] = str(i).encode('ascii') * 1024
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.player.prefetcher = Prefetcher(cache=AudioCache(path=path), ahead=4, behind=1,
+                                            client=self.show.client)
+        self.addCleanup(self.player.prefetcher.stop)
+
+    def fetched(self, *numbers):
+        paths = ['/{}.mp3'.format(n) for n in numbers]
+        return test_prefetch.wait_for(lambda: set(paths) <= set(self.server.paths()))
+
+    def test_fetches_ahead_on_every_track_change(self):
+        self.player.next_track()
+        self.assertTrue(self.fetched(2, 3, 4, 5))
+        self.backend.finish()
+        self.player.handle_events()
+        self.assertTrue(self.fetched(6))
+        self.player.next_track()
+        self.assertTrue(self.fetched(7))
+
+
+class TimedBackend(FakeBackend):
+
+    def load(self, source):
+        self.loaded_at = time.time()
+        FakeBackend.load(self, source)
+
+
+class TestLazyResolution(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        def slow(handler):
+            self.release.wait(5)
+            return 200, {}, test_models.page(3)
+        self.server = StubServer({
+            '/feed': test_models.FEED,
+            '/story/1': test_models.page(1, audio=False),
+            '/story/2': test_models.page(2),
+            '/story/3': slow,
+        }).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.addCleanup(self.release.set)
+        client = Client(hosts={'npr.test': self.server.url}, retries=0)
+        self.show = Show(feed='http://npr.test/feed', client=client,
+                         index=EpisodeIndex(path=':memory:'))
+        self.backend = TimedBackend()
+        self.player = Player(show=self.show, backend=self.backend, verbose=False,
+                             prefetch=0, gapless=False)
+
+    def test_first_playable_episode_starts_without_waiting_for_rest(self):
+        start = time.time()
+        self.player.next_track()
+        self.assertEqual(self.backend.calls, [('load', 'http://npr.test/2.mp3')])
+        self.assertLess(self.backend.loaded_at - start, 1)
+        self.assertIn('http://npr.test/story/1', self.show.failures)
+        self.release.set()
+        self.player.next_track()
+        self.assertEqual(self.backend.playing, 'http://npr.test/3.mp3')
+
+
+if __name__ == '__main__':
+    unittest.main()
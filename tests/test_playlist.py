@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+test_playlist
+----------------------------------
+
+Tests for `nprcli.playlist`.
+"""
+
+import unittest
+
+from nprcli.models import Episode
+from nprcli.playlist import Playlist
+
+
+class TestPlaylist(unittest.TestCase):
+
+    def setUp(self):
+        self.pulled = []
+        def source():
+            for i in range(5):
+                self.pulled.append(i)
+                yield i
+        self.playlist = Playlist(source=source())
+
+    def test_grows_lazily(self):
+        self.assertEqual(self.playlist.next(), 0)
+        self.assertEqual(self.playlist.peek(), 1)
+        self.assertEqual(self.pulled, [0, 1])
+        self.assertEqual(len(self.playlist), 2)
+        self.assertFalse(self.playlist.exhausted)
+
+    def test_next_wraps_and_previous_stops_at_first(self):
+        self.assertEqual(self.playlist.next(), 0)
+        self.assertEqual(self.playlist.previous(), 0)
+        self.assertEqual([self.playlist.next() for _ in range(5)], [1, 2, 3, 4, 0])
+
+    def test_no_wrap(self):
+        playlist = Playlist([1, 2], wrap=False)
+        self.assertEqual([playlist.next() for _ in range(3)], [1, 2, 2])
+        self.assertIsNone(playlist.peek())
+
+    def test_jump_and_index(self):
+        self.assertEqual(self.playlist.jump(3), 3)
+        self.assertEqual(self.playlist.index(3), 3)
+        self.assertEqual(self.playlist.previous(), 2)
+        with self.assertRaises(IndexError):
+            self.playlist.jump(5)
+        with self.assertRaises(ValueError):
+            self.playlist.index(9)
+
+    def test_append_and_seek(self):
+        self.playlist.next()
+        self.playlist.append(9)
+        self.assertEqual(list(self.playlist), [0, 9, 1, 2, 3, 4])
+        self.playlist.seek(7)
+        self.assertEqual(self.playlist.current, 7)
+        self.assertEqual(self.playlist.index(7), 6)
+
+    def test_enqueue_goes_after_the_source(self):
+        self.playlist.next()
+        self.playlist.enqueue([9, 3])
+        self.assertEqual(self.pulled, [0])
+        self.assertEqual(list(self.playlist), [0, 1, 2, 3, 4, 9])
+        self.playlist.enqueue([8])
+        self.assertEqual(self.playlist[-1], 8)
+
+    def test_shuffle_keeps_played_items(self):
+        self.playlist.jump(1)
+        self.playlist.shuffle()
+        self.assertEqual(self.playlist[:2], [0, 1])
+        self.assertEqual(sorted(self.playlist[2:]), [2, 3, 4])
+        self.assertEqual(self.playlist.current, 1)
+        for i, item in enumerate(self.playlist):
+            self.assertEqual(self.playlist.index(item), i)
+
+    def test_shuffle_does_not_pull_from_source(self):
+        self.playlist.jump(2)
+        self.playlist.shuffle()
+        self.assertEqual(self.pulled, [0, 1, 2])
+        self.assertEqual(list(self.playlist)[3:], [3, 4])
+
+    def test_episodes_are_keyed_by_url(self):
+        a = Episode('http://npr.test/story/1', client=object(), index=object())
+        b = Episode('http://npr.test/story/1', client=object(), index=object())
+        playlist = Playlist([a])
+        playlist.append(b)
+        self.assertEqual(len(playlist), 1)
+        self.assertEqual(playlist.index(b), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+test_prefetch
+----------------------------------
+
+Tests for `nprcli.prefetch`.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nprcli.client import Client
+from nprcli.playlist import Playlist
+from nprcli.prefetch import AudioCache, Prefetcher
+from nprcli.transcode import Transcoder
+
+from .support import StubServer
+from .test_transcode import fake_ffmpeg
+
+
+class FakeEpisode(object):
+
+    def __init__(self, mp3):
+        self.mp3 = mp3
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        def slow(handler):
+            self.release.wait(5)
+            return 200, {}, b'slow' * 1024
+        routes = dict(('/{}.mp3'.format(i), str(i).encode('ascii') * 1024) for i in range(5))
+        routes['/slow.mp3'] = slow
+        self.server = StubServer(routes).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cache = AudioCache(path=self.path)
+        self.prefetcher = Prefetcher(cache=self.cache, ahead=2, behind=1,
+                                     client=Client(hosts={'npr.test': self.server.url}))
+        self.addCleanup(self.prefetcher.stop)
+        self.playlist = [FakeEpisode('http://npr.test/{}.mp3'.format(i)) for i in range(5)]
+
+    def test_fetches_neighbours(self):
+        self.prefetcher.update(self.playlist, self.playlist[2])
+        for i in (1, 3, 4):
+            self.assertTrue(wait_for(lambda: self.prefetcher.local_path(self.playlist[i])))
+        self.assertIsNone(self.prefetcher.local_path(self.playlist[0]))
+        with open(self.prefetcher.local_path(self.playlist[3]), 'rb') as f:
+            self.assertEqual(f.read(), b'3' * 1024)
+
+    def test_pulls_from_playlist_source_on_its_own_thread(self):
+        pulled = []
+        def source():
+            for episode in self.playlist:
+                pulled.append(threading.current_thread())
+                yield episode
+        playlist = Playlist(source=source())
+        playlist.next()
+        self.prefetcher.update(playlist, playlist.current)
+        for i in (1, 2):
+            self.assertTrue(wait_for(lambda: self.prefetcher.local_path(self.playlist[i])))
+        self.assertEqual(pulled, [threading.current_thread(), self.prefetcher._thread,
+                                  self.prefetcher._thread])
+
+    def test_plays_compact_copies(self):
+        tools = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tools)
+        transcoder = Transcoder(ffmpeg=fake_ffmpeg(tools), keep_original=False)
+        self.addCleanup(transcoder.close)
+        self.prefetcher.transcoder = transcoder
+        self.prefetcher.update(self.playlist, self.playlist[0])
+        episode = self.playlist[1]
+        self.assertTrue(wait_for(lambda: (self.prefetcher.local_path(episode) or '').endswith('.opus')))
+        self.assertEqual(os.path.getsize(self.prefetcher.local_path(episode)), 256)
+        self.assertIsNone(self.cache.get(episode.mp3))
+
+    def test_evicts_over_budget(self):
+        self.cache.max_size = 1024
+        self.prefetcher.ahead, self.prefetcher.behind = 1, 0
+        self.prefetcher.update(self.playlist, self.playlist[0])
+        self.assertTrue(wait_for(lambda: self.prefetcher.local_path(self.playlist[1])))
+        self.prefetcher.update(self.playlist, self.playlist[2])
+        self.assertTrue(wait_for(lambda: self.prefetcher.local_path(self.playlist[3])))
+        self.assertTrue(wait_for(lambda: not self.cache.get(self.playlist[1].mp3)))
+        self.assertEqual(len(os.listdir(self.path)), 1)
+
+    def test_cancels_unwanted_download(self):
+        slow = FakeEpisode('http://npr.test/slow.mp3')
+        playlist = [self.playlist[0], slow, self.playlist[1], self.playlist[2], self.playlist[3]]
+        self.prefetcher.ahead = 1
+        self.prefetcher.update(playlist, playlist[0])
+        self.assertTrue(wait_for(lambda: self.server.paths() == ['/slow.mp3']))
+        self.prefetcher.update(playlist, playlist[3])
+        self.release.set()
+        self.assertTrue(wait_for(lambda: self.prefetcher.local_path(playlist[4])))
+        self.assertIsNone(self.prefetcher.local_path(slow))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+test_refresh
+----------------------------------
+
+Tests for `nprcli.refresh` and Show.refresh(), against a local stand-in server.
+"""
+
+import select
+import unittest
+
+from nprcli.refresh import Refresher
+
+from . import test_models
+from .test_player import ITEM, PlayerTestCase
+
+
+def feed(*numbers):
+    return ("""<?xml version="1.0"?><rss version="2.0"><channel><title>Morning Edition</title>"""
+            + ''.join(ITEM.format(n) for n in numbers) + "</channel></rss>").encode('utf-8')
+
+
+class TestShowRefresh(test_models.ShowTestCase):
+
+    def test_returns_only_new_items(self):
+        show = self.show()
+        self.assertEqual(len(show.episodes), 3)
+        self.pages['/feed'] = test_models.FEED.replace(
+            b'<item>', b'<item><link>http://npr.test/story/4</link></item><item>', 1)
+        new = show.refresh()
+        self.assertEqual([e.url for e in new], ['http://npr.test/story/4'])
+        self.assertEqual(show.episodes[-1].url, 'http://npr.test/story/4')
+        self.assertEqual(len(show.episodes), 4)
+
+    def test_unchanged_feed(self):
+        show = self.show()
+        show.episodes
+        self.assertEqual(show.refresh(), [])
+        self.assertEqual(len(show.episodes), 3)
+
+    def test_refresh_before_parsing(self):
+        show = self.show()
+        self.assertEqual(show.refresh(), [])
+        self.assertEqual(self.server.paths(), ['/feed', '/feed'])
+
+
+class TestRefresher(PlayerTestCase):
+
+    def setUp(self):
+        super(TestRefresher, self).setUp()
+        self.refresher = Refresher([self.show], interval=60)
+        self.addCleanup(self.refresher.stop)
+
+    def test_poll_queues_playable_episodes(self):
+        self.show.episodes
+        self.assertEqual(self.refresher.poll(), 0)
+        self.server.routes['/feed'] = feed(1, 2, 3, 4)
+        self.assertEqual(self.refresher.poll(), 1)
+        readable, _, _ = select.select([self.refresher.fileno()], [], [], 0)
+        self.assertEqual(readable, [self.refresher.fileno()])
+        (show, episodes), = self.refresher.read_updates()
+        self.assertIs(show, self.show)
+        self.assertEqual([e.title for e in episodes], ['Story 4'])
+        self.assertEqual(self.refresher.read_updates(), [])
+
+    def test_story_gains_audio_between_polls(self):
+        unposted = b'<item><title>Story 4</title><link>http://npr.test/story/4</link></item>'
+        self.server.routes['/story/4'] = test_models.page(4, audio=False)
+        self.show.episodes
+        self.server.routes['/feed'] = feed(1, 2, 3).replace(b'</channel>', unposted + b'</channel>')
+        self.assertEqual(self.refresher.poll(), 0)
+        self.assertIn('http://npr.test/story/4', self.show.failures)
+        self.assertEqual(self.refresher.poll(), 0)
+        self.refresher.read_updates()
+        self.server.routes['/feed'] = feed(1, 2, 3, 4)
+        self.assertEqual(self.refresher.poll(), 1)
+        (show, episodes), = self.refresher.read_updates()
+        self.assertEqual([e.mp3 for e in episodes], ['http://npr.test/4.mp3'])
+        self.assertNotIn('http://npr.test/story/4', self.show.failures)
+
+    def test_audio_posted_on_page_only(self):
+        unposted = b'<item><title>Story 4</title><link>http://npr.test/story/4</link></item>'
+        self.server.routes['/story/4'] = test_models.page(4, audio=False)
+        self.show.episodes
+        self.server.routes['/feed'] = feed(1, 2, 3).replace(b'</channel>', unposted + b'</channel>')
+        self.assertEqual(self.refresher.poll(), 0)
+        self.server.routes['/story/4'] = test_models.page(4)
+        self.assertEqual(self.refresher.poll(), 1)
+
+    def test_records_failures(self):
+        self.show.episodes
+        del self.server.routes['/feed']
+        self.assertEqual(self.refresher.poll(), 0)
+        self.assertIn(self.show.feed, self.refresher.failures)
+
+    def test_player_appends_new_episodes(self):
+        player = self.make_player(refresh=60)
+        self.addCleanup(player.refresher.stop)
+        player.next_track()
+        list(player.playlist)
+        self.server.routes['/feed'] = feed(1, 2, 3, 4)
+        player.refresher.poll()
+        self.assertFalse(player.handle_refresh())
+        self.assertEqual([e.title for e in player.playlist], ['Story 1', 'Story 2', 'Story 3', 'Story 4'])
+
+    def test_player_appends_after_episodes_still_to_come(self):
+        self.server.routes['/feed'] = feed(1, 2, 3, 4, 5)
+        player = self.make_player(refresh=60)
+        self.addCleanup(player.refresher.stop)
+        player.next_track()
+        self.server.routes['/feed'] = feed(1, 2, 3, 4, 5, 6)
+        player.refresher.poll()
+        player.handle_refresh()
+        self.assertEqual([e.title for e in player.playlist], ['Story {}'.format(n) for n in range(1, 7)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+test_resume
+----------------------------------
+
+Tests for `nprcli.resume` and resuming playback in Player.
+"""
+
+import os
+import json
+import datetime
+import shutil
+import tempfile
+import unittest
+
+from nprcli.backends import FakeBackend
+from nprcli.models import Player
+from nprcli.resume import Resume
+
+from . import test_models
+
+
+class ResumeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'resume.json')
+
+
+class TestResume(ResumeTestCase):
+
+    def test_updates_are_written_in_one_batch(self):
+        resume = Resume(path=self.path)
+        for second in range(100):
+            resume.update('feed', 'http://npr.test/story/1', second)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(resume.flush())
+        self.assertFalse(resume.flush())
+        self.assertEqual(resume.writes, 1)
+        self.assertEqual(os.listdir(self.dir), ['resume.json'])
+        state = Resume(path=self.path).get('feed')
+        self.assertEqual(state['url'], 'http://npr.test/story/1')
+        self.assertEqual(state['position'], 99)
+
+    def test_state_from_another_show_is_ignored(self):
+        resume = Resume(path=self.path)
+        resume.update('feed', 'http://npr.test/story/1', 10)
+        resume.flush()
+        self.assertIsNotNone(resume.get('feed'))
+        self.assertIsNone(resume.get('other feed'))
+        self.assertIsNone(resume.get(None))
+
+    def test_each_show_keeps_its_place(self):
+        resume = Resume(path=self.path)
+        resume.update('feed', 'http://npr.test/story/1', 10)
+        resume.update('library', '/music/a.mp3', 20)
+        resume.flush()
+        other = Resume(path=self.path)
+        other.update('feed', 'http://npr.test/story/2', 30)
+        other.flush()
+        state = Resume(path=self.path)
+        self.assertEqual(state.get('feed')['url'], 'http://npr.test/story/2')
+        self.assertEqual(state.get('library')['position'], 20)
+        state.clear('feed')
+        self.assertEqual(sorted(Resume(path=self.path).load()), ['library'])
+
+    def test_least_recently_played_shows_are_dropped(self):
+        for n in range(5):
+            resume = Resume(path=self.path, max_shows=3)
+            resume.update('feed {}'.format(n), 'http://npr.test/story/1', n)
+            resume.flush()
+        self.assertEqual(sorted(Resume(path=self.path).load()), ['feed 2', 'feed 3', 'feed 4'])
+
+    def test_unreadable_state(self):
+        with open(self.path, 'w') as f:
+            f.write('{"url": ')
+        self.assertEqual(Resume(path=self.path).load(), {})
+
+    def test_stop_writes_last_change(self):
+        resume = Resume(path=self.path, interval=60)
+        resume.start()
+        resume.update('feed', 'http://npr.test/story/1', 5)
+        resume.stop()
+        self.assertEqual(resume.load()['feed']['position'], 5)
+
+
+class TestPlayerResume(test_models.ShowTestCase):
+
+    def setUp(self):
+        super(TestPlayerResume, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'resume.json')
+        self.backend = FakeBackend()
+
+    def player(self, **kwargs):
+        return Player(show=self.show(**kwargs), backend=self.backend, verbose=False, prefetch=0,
+                      resume=Resume(path=self.path))
+
+    def test_records_episode_and_position(self):
+        player = self.player()
+        player.next_track()
+        self.backend.position = 42.0
+        player.track_position()
+        player.resume.flush()
+        with open(self.path) as f:
+            state = json.load(f)['shows']['http://npr.test/feed']
+        self.assertEqual(state['url'], 'http://npr.test/story/1')
+        self.assertEqual(state['position'], 42.0)
+        self.assertEqual(state['fields']['mp3'], 'http://npr.test/1.mp3')
+
+    def test_resumes_without_resolving_earlier_episodes(self):
+        resume = Resume(path=self.path)
+        resume.update('http://npr.test/feed', 'http://npr.test/story/3', 61.5,
+                      {'title': 'Story 3', 'mp3': 'http://npr.test/3.mp3'})
+        resume.flush()
+        player = self.player()
+        self.assertTrue(player.resume_playback())
+        self.assertEqual(player.now_playing.title, 'Story 3')
+        self.assertEqual(self.backend.calls, [('load', 'http://npr.test/3.mp3'), ('seek', 61.5)])
+        self.assertEqual(player.playlist.current, player.now_playing)
+        self.assertEqual(self.server.paths(), ['/feed', '/story/3'])
+        player.next_track()
+        self.assertEqual(player.now_playing.url, 'http://npr.test/story/3')
+
+    def test_other_edition_is_not_resumed(self):
+        resume = Resume(path=self.path)
+        resume.update(self.show(edition=datetime.date(2014, 12, 29)).key,
+                      'http://npr.test/story/3', 600, {'mp3': 'http://npr.test/3.mp3'})
+        resume.flush()
+        player = self.player(edition=datetime.date(2015, 1, 5))
+        self.assertFalse(player.resume_playback())
+        self.assertEqual(self.backend.calls, [])
+
+    def test_nothing_to_resume(self):
+        player = self.player()
+        self.assertFalse(player.resume_playback())
+        self.assertEqual(self.backend.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
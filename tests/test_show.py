@@ -1,44 +1,53 @@
 #!/usr/bin/env python3 
-import sys
 import os
 import unittest
-import requests
 
-NEW_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-sys.path.insert(0, NEW_PATH)
-import npr
-import npr.show
+from nprcli.client import Client
+from nprcli.feed import iter_items
+from nprcli.index import EpisodeIndex
+from nprcli.models import Show
 
-class TestNPRShow(unittest.TestCase):
+from .support import StubServer
 
-    def setUp(self):
-        # Print out name of method
-        sys.stdout.write("\nRunning test '%s'..." % self._testMethodName)
-        sys.stdout.flush()
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
 
-        # Let's stock some data for the unittest obj...
-        self.show = npr.show.Show()
 
+class TestNPRShow(unittest.TestCase):
+    """Show against the recorded Morning Edition feed, served locally."""
+
+    def setUp(self):
+        feed = fixture('morning_edition.xml')
+        routes = {'/rss/rss.php?id=3': feed}
+        for item in iter_items([feed]):
+            path = item['link'].split('www.npr.org', 1)[1]
+            routes[path] = fixture('story-noaudio.html' if path.endswith('/story-2') else 'story.html')
+        self.server = StubServer(routes).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'www.npr.org': self.server.url}, retries=0)
+        self.show = Show(program='morning_edition', client=self.client,
+                         index=EpisodeIndex(path=':memory:'))
 
     def test_fetch_feeds(self):
-        r = requests.get(self.show.feed)
+        r = self.client.get(self.show.feed)
         self.assertTrue(r.ok)
 
-    def ztest_find_mp3s(self):
-        mp3s = self.show.mp3s
-        for m in mp3s:
-            r = requests.head(m)
-            self.assertTrue(r.ok)
+    def test_find_mp3s(self):
+        self.show.prefetch()
+        self.assertEqual(list(self.show.failures),
+                         ['http://www.npr.org/2015/01/05/375000002/story-2'])
+        mp3s = [e.mp3 for e in self.show.episodes if e.url not in self.show.failures]
+        self.assertEqual(len(mp3s), 19)
 
     def test_find_episodes(self):
         episodes = self.show.episodes
-        for e in episodes:
-            print(e)
-
-    def ztest_next_track(self):
-        mp3s = self.show.mp3s
-        for i in range(1, 10): 
-            print(self.show.next_track())
+        self.assertEqual(len(episodes), 20)
+        self.assertEqual(str(self.show), 'Morning Edition (Mon, 05 Jan 2015 06:02:00 -0500)')
+        self.assertEqual(episodes[0].title, "Shaky Economy Tests Greece's Resolve")
 
 
 if __name__ == '__main__':
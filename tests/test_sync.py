@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+test_sync
+----------------------------------
+
+Tests for `nprcli.sync`, against a local stand-in server.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from nprcli.client import Client
+from nprcli.download import Throttle
+from nprcli.index import EpisodeIndex
+from nprcli.models import Show
+from nprcli.sync import Sync, read_manifest
+
+from .support import StubServer, ranged
+from .test_models import FEED, page
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({
+            '/feed': FEED,
+            '/story/1': page(1),
+            '/story/2': page(2, audio=False),
+            '/story/3': page(3),
+            '/1.mp3': ranged(b'1' * 4096),
+            '/3.mp3': ranged(b'3' * 4096),
+        }).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.client = Client(hosts={'npr.test': self.server.url}, retries=0)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def show(self, **kwargs):
+        return Show(client=self.client, index=EpisodeIndex(path=':memory:'), **kwargs)
+
+    def sync(self):
+        return Sync(client=self.client, verbose=False).run(
+            {self.dir: self.show(feed='http://npr.test/feed')})
+
+    def test_sync_writes_files_and_manifest(self):
+        self.sync()
+        manifest = read_manifest(self.dir)
+        self.assertEqual(manifest['title'], 'Morning Edition')
+        self.assertEqual([e['url'] for e in manifest['episodes']],
+                         ['http://npr.test/story/1', 'http://npr.test/story/3'])
+        for e in manifest['episodes']:
+            self.assertEqual(os.path.getsize(os.path.join(self.dir, e['file'])), 4096)
+
+    def test_skips_existing_files(self):
+        self.sync()
+        self.sync()
+        self.assertEqual(self.server.paths().count('/1.mp3'), 1)
+
+    def test_offline_show_from_library(self):
+        self.sync()
+        show = self.show(library=self.dir)
+        requests = len(self.server.requests)
+        self.assertEqual(show.title, 'Morning Edition')
+        self.assertEqual(show.episodes[1].title, 'Story 3')
+        self.assertTrue(os.path.exists(show.episodes[1].mp3))
+        self.assertEqual(len(self.server.requests), requests)
+
+
+class TestThrottle(unittest.TestCase):
+
+    def test_limits_rate(self):
+        throttle = Throttle(100 * 1024, burst=1024)
+        start = time.time()
+        for _ in range(20):
+            throttle.consume(1024)
+        self.assertGreaterEqual(time.time() - start, 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
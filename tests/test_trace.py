@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+test_trace
+----------------------------------
+
+Tests for `nprcli.trace`.
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+
+from nprcli import trace
+from nprcli.cache import HTTPCache
+from nprcli.client import Client
+from nprcli.trace import Tracer
+
+from .test_models import ShowTestCase
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_disabled_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span('step') as attrs:
+            attrs['bytes'] = 10
+        tracer.count('hits')
+        self.assertEqual(tracer.spans, [])
+        self.assertEqual(tracer.counters, {})
+
+    def test_summary(self):
+        tracer = Tracer()
+        tracer.enable()
+        for size in (1024, 2048):
+            with tracer.span('http.body', bytes=size):
+                pass
+        tracer.count('cache.hit', 3)
+        lines = tracer.summary().splitlines()
+        self.assertEqual(lines[1].split()[:2], ['http.body', '2'])
+        self.assertEqual(lines[1].split()[-1], '3.0')
+        self.assertEqual(lines[-1].split(), ['cache.hit', '3'])
+
+    def test_export_trace(self):
+        tracer = Tracer()
+        tracer.enable()
+        with tracer.span('extract', url='http://npr.test/story/1', parsed=object()):
+            pass
+        events = tracer.export_trace()['traceEvents']
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertEqual(events[0]['name'], 'extract')
+        self.assertEqual(events[0]['args'], {'url': 'http://npr.test/story/1'})
+        json.dumps(events)
+
+
+class TestTracedShow(ShowTestCase):
+
+    def setUp(self):
+        super(TestTracedShow, self).setUp()
+        self.addCleanup(trace.tracer.reset)
+        trace.tracer.reset()
+        trace.tracer.enable()
+
+    def test_records_network_and_parse_steps(self):
+        show = self.show()
+        next(show.iter_playable(workers=1))
+        names = set(s.name for s in trace.tracer.spans)
+        self.assertTrue({'http.request', 'http.body', 'feed.parse',
+                         'episode.metadata', 'extract'} <= names)
+        body = [s for s in trace.tracer.spans
+                if s.name == 'http.body' and s.attrs['url'] == 'http://npr.test/story/1']
+        self.assertEqual(body[0].attrs['bytes'], len(self.pages['/story/1']))
+        self.assertGreaterEqual(trace.tracer.counters['index.miss'], 1)
+
+    def test_counts_cache_hits(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        client = Client(hosts={'npr.test': self.server.url}, retries=0, cache=HTTPCache(path=tmp))
+        client.fetch('http://npr.test/feed', ttl=60)
+        client.fetch('http://npr.test/feed', ttl=60)
+        self.assertEqual(trace.tracer.counters['cache.miss'], 1)
+        self.assertEqual(trace.tracer.counters['cache.hit'], 1)
+        self.assertEqual(trace.tracer.counters['cache.bytes'], len(self.pages['/feed']))
+
+
+if __name__ == '__main__':
+    unittest.main()
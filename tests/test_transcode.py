@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+test_transcode
+----------------------------------
+
+Tests for `nprcli.transcode`, with a stand-in for ffmpeg.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nprcli.client import Client
+from nprcli.exceptions import TranscodeError
+from nprcli.index import EpisodeIndex
+from nprcli.models import Show
+from nprcli.sync import Sync, read_manifest
+from nprcli.transcode import Transcoder, compact_path
+
+from .support import StubServer, ranged
+from .test_models import FEED, page
+
+# Writes the first quarter of the input to the output, like a 4:1 encoder;
+# fails on input starting with "bad", and sleeps for $FAKE_FFMPEG_SLEEP.
+FAKE_FFMPEG = """#!{python}
+import os, sys, time
+args = sys.argv[1:]
+src, dst = args[args.index('-i') + 1], args[-1]
+time.sleep(float(os.environ.get('FAKE_FFMPEG_SLEEP', 0)))
+data = open(src, 'rb').read()
+if data.startswith(b'bad'):
+    sys.stderr.write('Invalid data found when processing input\\n')
+    sys.exit(1)
+open(dst, 'wb').write(data[:len(data) // 4])
+"""
+
+
+def fake_ffmpeg(directory):
+    path = os.path.join(directory, 'ffmpeg')
+    with open(path, 'w') as f:
+        f.write(FAKE_FFMPEG.format(python=sys.executable))
+    os.chmod(path, 0o755)
+    return path
+
+
+class TranscodeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.ffmpeg = fake_ffmpeg(self.dir)
+
+    def audio(self, name, content=b'a' * 4096):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+
+class TestTranscoder(TranscodeTestCase):
+
+    def test_transcode(self):
+        source = self.audio('story.mp3')
+        result = Transcoder(ffmpeg=self.ffmpeg).transcode(source)
+        self.assertEqual(result.path, compact_path(source))
+        self.assertTrue(result.path.endswith('story.compact.opus'))
+        self.assertEqual((result.source_size, result.size), (4096, 1024))
+        self.assertAlmostEqual(result.ratio, 0.25)
+        self.assertTrue(os.path.exists(source))
+
+    def test_drops_original(self):
+        source = self.audio('story.mp3')
+        Transcoder(ffmpeg=self.ffmpeg, keep_original=False).transcode(source)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['ffmpeg', 'story.compact.opus'])
+
+    def test_failure_leaves_no_output(self):
+        source = self.audio('story.mp3', b'bad audio')
+        with self.assertRaises(TranscodeError) as cm:
+            Transcoder(ffmpeg=self.ffmpeg, keep_original=False).transcode(source)
+        self.assertIn('Invalid data', str(cm.exception))
+        self.assertEqual(sorted(os.listdir(self.dir)), ['ffmpeg', 'story.mp3'])
+
+    def test_missing_ffmpeg(self):
+        transcoder = Transcoder(ffmpeg=os.path.join(self.dir, 'missing'))
+        with self.assertRaises(TranscodeError):
+            transcoder.transcode(self.audio('story.mp3'))
+
+    def test_submit_is_bounded(self):
+        os.environ['FAKE_FFMPEG_SLEEP'] = '0.3'
+        self.addCleanup(os.environ.pop, 'FAKE_FFMPEG_SLEEP')
+        transcoder = Transcoder(ffmpeg=self.ffmpeg, workers=1, queue_size=1)
+        self.addCleanup(transcoder.close)
+        sources = [self.audio('{}.mp3'.format(n)) for n in range(3)]
+        futures = [transcoder.submit(s) for s in sources[:2]]
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (futures.append(transcoder.submit(sources[2])),
+                                                  submitted.set()))
+        thread.start()
+        self.assertFalse(submitted.wait(0.1))
+        thread.join(5)
+        self.assertTrue(futures[0].done())
+        for f in futures:
+            self.assertEqual(f.result().size, 1024)
+
+
+class TestCompactSync(TranscodeTestCase):
+
+    def test_manifest_lists_compact_files(self):
+        with StubServer({'/feed': FEED, '/story/1': page(1), '/story/2': page(2, audio=False),
+                         '/story/3': page(3), '/1.mp3': ranged(b'1' * 4096),
+                         '/3.mp3': ranged(b'bad' * 1024)}) as server:
+            client = Client(hosts={'npr.test': server.url}, retries=0)
+            show = Show(feed='http://npr.test/feed', client=client, index=EpisodeIndex(path=':memory:'))
+            library = os.path.join(self.dir, 'library')
+            transcoder = Transcoder(ffmpeg=self.ffmpeg, keep_original=False)
+            self.addCleanup(transcoder.close)
+            Sync(client=client, verbose=False, transcoder=transcoder).run({library: show})
+        files = [e['file'] for e in read_manifest(library)['episodes']]
+        self.assertEqual(files, ['story-1.compact.opus', 'story-3.mp3'])
+        self.assertEqual(os.path.getsize(os.path.join(library, files[0])), 1024)
+        played = Show(library=library, client=client, index=EpisodeIndex(path=':memory:'))
+        self.assertEqual(played.episodes[0].mp3,
+                         os.path.join(library, 'story-1.compact.opus'))
+
+
+if __name__ == '__main__':
+    unittest.main()
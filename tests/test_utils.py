@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+test_utils
+----------------------------------
+
+Tests for `nprcli.utils`.
+"""
+
+import os
+import pty
+import time
+import threading
+import unittest
+
+from nprcli import utils
+
+
+class TestListen(unittest.TestCase):
+
+    def setUp(self):
+        self.master, self.slave = pty.openpty()
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, self.slave)
+        self.stdin = open(self.slave, 'rb', buffering=0, closefd=False)
+        self.addCleanup(self.stdin.close)
+        # Stands in for the backend's event fd: the loop ends once it's readable.
+        self.r, self.w = os.pipe()
+        self.addCleanup(os.close, self.r)
+        self.addCleanup(os.close, self.w)
+        self.calls = []
+
+    def listen(self, dispatch_table):
+        def done():
+            self.calls.append(('done', time.time()))
+            return True
+        thread = threading.Thread(target=utils.listen,
+                                  args=(dispatch_table, {self.r: done}, self.stdin))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def test_keys_dispatch_immediately(self):
+        pressed = threading.Event()
+        thread = self.listen({'x': pressed.set})
+        time.sleep(0.05)
+        start = time.time()
+        os.write(self.master, b'x')
+        self.assertTrue(pressed.wait(1))
+        self.assertLess(time.time() - start, 0.1)
+        os.write(self.w, b'.')
+        thread.join(5)
+        self.assertEqual([c for c, _ in self.calls], ['done'])
+
+    def test_watch_ends_loop(self):
+        thread = self.listen({})
+        time.sleep(0.05)
+        start = time.time()
+        os.write(self.w, b'.')
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(self.calls[0][1] - start, 0.1)
+
+    def test_terminal_mode_restored(self):
+        import termios
+        before = termios.tcgetattr(self.slave)
+        thread = self.listen({})
+        time.sleep(0.05)
+        self.assertFalse(termios.tcgetattr(self.slave)[3] & termios.ICANON)
+        os.write(self.w, b'.')
+        thread.join(5)
+        self.assertEqual(termios.tcgetattr(self.slave), before)
+
+
+class TestMapConcurrently(unittest.TestCase):
+
+    def test_order_and_errors(self):
+        def fn(x):
+            if x == 2:
+                raise ValueError(x)
+            return x * 10
+        results = utils.map_concurrently(fn, [1, 2, 3], workers=3)
+        self.assertEqual([r for r, _ in results], [10, None, 30])
+        self.assertIsInstance(results[1][1], ValueError)
+
+
+class Page(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    @utils.lazyproperty
+    def fields(self):
+        """Parsed fields."""
+        self.calls += 1
+        time.sleep(0.05)
+        if self.fail:
+            raise ValueError
+        return {'n': self.calls}
+
+    @utils.lazyproperty(ttl=0.1)
+    def feed(self):
+        self.calls += 1
+        return self.calls
+
+
+class TestLazyProperty(unittest.TestCase):
+
+    def test_single_flight(self):
+        page = Page()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(page.fields))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(page.calls, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_errors_are_not_cached(self):
+        page = Page()
+        page.fail = True
+        with self.assertRaises(ValueError):
+            page.fields
+        page.fail = False
+        self.assertEqual(page.fields, {'n': 2})
+
+    def test_ttl(self):
+        page = Page()
+        self.assertEqual(page.feed, 1)
+        self.assertEqual(page.feed, 1)
+        time.sleep(0.15)
+        self.assertEqual(page.feed, 2)
+
+    def test_invalidate(self):
+        page = Page()
+        page.fields
+        del page.fields
+        self.assertEqual(page.fields, {'n': 2})
+        page.feed
+        utils.invalidate(page)
+        page.fields
+        page.feed
+        self.assertEqual(page.calls, 5)
+        with self.assertRaises(AttributeError):
+            page.fields = {}
+
+    def test_class_access(self):
+        self.assertEqual(Page.fields.__doc__, 'Parsed fields.')
+
+
+if __name__ == '__main__':
+    unittest.main()